@@ -0,0 +1,815 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.server
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import urllib.parse
+from loguru import logger
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIGS_DIR = os.path.join(SCRIPT_DIR, 'configs')
+
+THROUGHPUT_METRICS = ('pages_per_second', 'items_per_second', 'parses_per_second', 'video_extracts_per_second', 'videos_per_second')
+VOID_TAGS = {'meta', 'link', 'img', 'source', 'input', 'br'}
+HEAD_TAGS = {'title', 'meta', 'link'}
+COMPOUND_REGEX = re.compile(r"^([a-zA-Z][\w-]*)?((?:#[\w-]+|\.[\w-]+|\[[^\]]+\])*)$")
+COMPOUND_PART_REGEX = re.compile(r"#([\w-]+)|\.([\w-]+)|\[([\w-]+)(?:[~|^$*]?=['\"]?([^'\"\]]*)['\"]?)?\]")
+MEDIA_BLOCK = bytes(range(256)) * 256
+
+# Fixture HTML
+
+class Node:
+    def __init__(self, compound):
+        match = COMPOUND_REGEX.match(compound)
+        if not match:
+            raise ValueError(f"unsupported selector part '{compound}'")
+        self.tag = match.group(1) or 'div'
+        self.attrs = {}
+        classes = []
+        for id_value, class_name, attribute, value in COMPOUND_PART_REGEX.findall(match.group(2)):
+            if id_value:
+                self.attrs['id'] = id_value
+            elif class_name:
+                classes.append(class_name)
+            else:
+                self.attrs[attribute] = value
+        if classes:
+            self.attrs['class'] = ' '.join(classes)
+        self.text = ''
+        self.children = []
+
+    def child(self, compound):
+        # Fields sharing a selector share an element
+        for existing_compound, node in self.children:
+            if existing_compound == compound:
+                return node
+        return self.add(compound)
+
+    def add(self, compound):
+        node = Node(compound)
+        self.children.append((compound, node))
+        return node
+
+    def render(self):
+        attrs = ''.join(f' {name}="{value}"' for name, value in self.attrs.items())
+        if self.tag in VOID_TAGS:
+            return f"<{self.tag}{attrs}>"
+        inner = self.text + ''.join(node.render() for _, node in self.children)
+        return f"<{self.tag}{attrs}>{inner}</{self.tag}>"
+
+class Document:
+    def __init__(self):
+        self.head = Node('head')
+        self.body = Node('body')
+
+    def parent_for(self, compounds):
+        # Returns the node the remaining compounds hang from
+        first = Node(compounds[0]).tag
+        if first == 'html':
+            return self.parent_for(compounds[1:])
+        if first == 'head':
+            return self.head, compounds[1:]
+        if first == 'body':
+            return self.body, compounds[1:]
+        return (self.head if first in HEAD_TAGS else self.body), compounds
+
+    def render(self):
+        return f"<!DOCTYPE html><html>{self.head.render()}{self.body.render()}</html>"
+
+def selector_compounds(selector):
+    if selector.startswith(('/', '.', '(')):
+        raise ValueError(f"XPath selector '{selector}' is not supported")
+    # Only the first alternative of a selector group needs to match
+    selector = selector.split(',')[0].strip()
+    return [part for part in re.split(r'\s*[>+~]\s*|\s+', selector) if part]
+
+def place(document_or_node, selector):
+    if selector is None:
+        return document_or_node
+    compounds = selector_compounds(selector)
+    if isinstance(document_or_node, Document):
+        node, compounds = document_or_node.parent_for(compounds)
+    else:
+        node = document_or_node
+    for compound in compounds:
+        node = node.child(compound)
+    return node
+
+def field_value(field, key, base_url):
+    if field == 'url':
+        return f"/__video/{key}"
+    if field == 'video_key':
+        return key
+    if field == 'title':
+        return f"Bench video {key}"
+    if field == 'download_url':
+        return f"{base_url}/__media/{key}.mp4"
+    return 'bench'
+
+def fill_fields(node_or_document, fields, key, base_url):
+    # url goes last so it wins when it shares an attribute with video_key
+    for field, config in sorted(fields.items(), key=lambda item: item[0] == 'url'):
+        if isinstance(config, str):
+            config = {'selector': config}
+        if not isinstance(config, dict) or not ('selector' in config or 'attribute' in config):
+            continue
+        node = place(node_or_document, config.get('selector'))
+        value = field_value(field, key, base_url)
+        if config.get('attribute'):
+            node.attrs[config['attribute']] = value
+        else:
+            node.text = value
+
+class SiteFixture:
+    def __init__(self, site, site_config, pages, items, media_size):
+        self.site = site
+        self.site_config = site_config
+        self.pages = pages
+        self.items = items
+        self.media_size = media_size
+        self.page_urls = {}
+        self.base_url = None
+
+    def bind(self, base_url, page_urls):
+        self.base_url = base_url
+        self.page_urls = {normalize_path(url): page for page, url in page_urls.items()}
+
+    def list_page(self, page):
+        list_scraper = self.site_config['scrapers']['list_scraper']
+        document = Document()
+        container = place(document, list_scraper['video_container']['selector'][0])
+        if page <= self.pages:
+            compounds = selector_compounds(list_scraper['video_item']['selector'])
+            for i in range(self.items):
+                parent = container
+                for compound in compounds[:-1]:
+                    parent = parent.child(compound)
+                item = parent.add(compounds[-1])
+                fill_fields(item, list_scraper['video_item']['fields'], f"{page}-{i}", self.base_url)
+        next_page = list_scraper.get('pagination', {}).get('next_page')
+        if next_page and page < self.pages:
+            node = place(document, next_page['selector'])
+            node.attrs[next_page.get('attribute', 'href')] = f"/__list/{page + 1}"
+            node.text = 'Next'
+        return document.render()
+
+    def video_page(self, key):
+        document = Document()
+        fill_fields(document, self.site_config['scrapers']['video_scraper'], key, self.base_url)
+        return document.render()
+
+    def page_number(self, path):
+        if path.startswith('/__list/'):
+            return int(path.rsplit('/', 1)[1])
+        return self.page_urls.get(normalize_path(path), 1)
+
+def normalize_path(url):
+    parts = urllib.parse.urlsplit(url)
+    return urllib.parse.unquote(parts.path.rstrip('/')) + '?' + urllib.parse.unquote(parts.query)
+
+# Local site stand-in
+
+class FixtureServer:
+    def __init__(self, fixture, latency=0, throttle=0, seed=1):
+        self.fixture = fixture
+        self.latency = latency
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.reset()
+        handler = type('FixtureHandler', (FixtureHandler,), {'server_state': self})
+        self.httpd = QuietHTTPServer(('127.0.0.1', 0), handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'throttled': 0, 'bytes': 0}
+
+    def should_throttle(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.throttle and self.random.random() < self.throttle:
+                self.stats['throttled'] += 1
+                return True
+        return False
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.stats['bytes'] += size
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class QuietHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections between scenarios is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server_state
+        if state.latency:
+            time.sleep(state.latency)
+        if state.should_throttle():
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        path = self.path
+        if path.startswith('/__media/'):
+            self.send_media()
+            return
+        if path.startswith('/__video/'):
+            body = state.fixture.video_page(urllib.parse.unquote(path.split('/')[2])).encode()
+        else:
+            body = state.fixture.list_page(state.fixture.page_number(path)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        state.count_bytes(len(body))
+
+    def send_media(self):
+        size = self.server_state.fixture.media_size
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        position = start
+        while position <= end:
+            offset = position % len(MEDIA_BLOCK)
+            chunk = MEDIA_BLOCK[offset:offset + min(len(MEDIA_BLOCK) - offset, end - position + 1)]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            position += len(chunk)
+        self.server_state.count_bytes(position - start)
+
+# Fake SMB share backed by a local directory
+
+class FakeSMBConnection:
+    root = None
+
+    def __init__(self, username, password, my_name, remote_name, **kwargs):
+        pass
+
+    def connect(self, server, port=445, timeout=60):
+        return True
+
+    def close(self):
+        pass
+
+    def _local_path(self, share, path):
+        return os.path.join(self.root, share, path.lstrip('/'))
+
+    def storeFile(self, share, path, file, timeout=30):
+        local_path = self._local_path(share, path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        size = 0
+        with open(local_path, 'wb') as out:
+            while True:
+                chunk = file.read(65536)
+                if not chunk:
+                    break
+                out.write(chunk)
+                size += len(chunk)
+        return size
+
+    def getAttributes(self, share, path):
+        from smb.smb_structs import OperationFailure
+        local_path = self._local_path(share, path)
+        if not os.path.exists(local_path):
+            raise OperationFailure(f"Unable to open file {path}", [])
+        return os.stat(local_path)
+
+    def listPath(self, share, path, **kwargs):
+        local_path = self._local_path(share, path)
+        if not os.path.isdir(local_path):
+            return []
+        with os.scandir(local_path) as entries:
+            return [types.SimpleNamespace(filename=entry.name, isDirectory=entry.is_dir(), file_size=entry.stat().st_size) for entry in entries]
+
+    def createDirectory(self, share, path, **kwargs):
+        os.makedirs(self._local_path(share, path))
+
+    def deleteFiles(self, share, path_file_pattern, **kwargs):
+        from smb.smb_structs import OperationFailure
+        local_path = self._local_path(share, path_file_pattern)
+        if not os.path.exists(local_path):
+            raise OperationFailure(f"Unable to delete file {path_file_pattern}", [])
+        os.remove(local_path)
+
+    def rename(self, share, old_path, new_path, **kwargs):
+        from smb.smb_structs import OperationFailure
+        new_local_path = self._local_path(share, new_path)
+        if os.path.exists(new_local_path):
+            raise OperationFailure(f"Unable to rename {old_path}: {new_path} exists", [])
+        os.rename(self._local_path(share, old_path), new_local_path)
+
+# WebDAV share backed by a local directory
+
+class WebDAVServer:
+    def __init__(self, root, quota=None):
+        self.root = root
+        self.quota = quota
+        os.makedirs(root, exist_ok=True)
+        handler = type('WebDAVHandler', (WebDAVHandler,), {'share': self})
+        self.httpd = QuietHTTPServer(('127.0.0.1', 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/dav"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class WebDAVHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    share = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def local_path(self, url=None):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url or self.path).path)
+        relative = os.path.normpath(path[len('/dav'):].lstrip('/')) if path.startswith('/dav') else None
+        if relative is None or relative.startswith('..'):
+            return None
+        return os.path.join(self.share.root, relative)
+
+    def reply(self, code, body=b'', content_type='text/plain'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def drain(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+
+    def do_PROPFIND(self):
+        self.drain()
+        local_path = self.local_path()
+        if local_path is None or not os.path.exists(local_path):
+            self.reply(404)
+            return
+        paths = [local_path]
+        if os.path.isdir(local_path) and self.headers.get('Depth', '1') != '0':
+            paths += [os.path.join(local_path, name) for name in sorted(os.listdir(local_path))]
+        base = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        responses = []
+        for path in paths:
+            href = base if path == local_path else f"{base}/{urllib.parse.quote(os.path.basename(path))}"
+            if os.path.isdir(path):
+                props = '<d:resourcetype><d:collection/></d:resourcetype>'
+                if self.share.quota is not None:
+                    props += f"<d:quota-available-bytes>{self.share.quota - directory_size(self.share.root)}</d:quota-available-bytes>"
+            else:
+                props = f"<d:resourcetype/><d:getcontentlength>{os.path.getsize(path)}</d:getcontentlength>"
+            responses.append(f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{props}</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>")
+        body = f'<?xml version="1.0" encoding="utf-8"?><d:multistatus xmlns:d="DAV:">{"".join(responses)}</d:multistatus>'
+        self.reply(207, body.encode(), 'application/xml; charset=utf-8')
+
+    def do_MKCOL(self):
+        self.drain()
+        local_path = self.local_path()
+        if local_path is None or os.path.exists(local_path):
+            self.reply(405)
+            return
+        os.makedirs(local_path)
+        self.reply(201)
+
+    def do_PUT(self):
+        local_path = self.local_path()
+        length = int(self.headers.get('Content-Length', 0))
+        if local_path is None or not os.path.isdir(os.path.dirname(local_path)):
+            self.drain()
+            self.reply(409)
+            return
+        if self.share.quota is not None and directory_size(self.share.root) + length > self.share.quota:
+            self.drain()
+            self.reply(507)
+            return
+        with open(local_path, 'wb') as file:
+            remaining = length
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 65536))
+                if not chunk:
+                    break
+                file.write(chunk)
+                remaining -= len(chunk)
+        self.reply(201)
+
+    def do_HEAD(self):
+        local_path = self.local_path()
+        self.reply(200 if local_path is not None and os.path.isfile(local_path) else 404)
+
+    def do_DELETE(self):
+        local_path = self.local_path()
+        if local_path is None or not os.path.isfile(local_path):
+            self.reply(404)
+            return
+        os.remove(local_path)
+        self.reply(204)
+
+    def do_MOVE(self):
+        self.drain()
+        local_path = self.local_path()
+        destination_path = self.local_path(self.headers.get('Destination', ''))
+        if local_path is None or destination_path is None or not os.path.isfile(local_path):
+            self.reply(404)
+            return
+        existed = os.path.exists(destination_path)
+        if existed and self.headers.get('Overwrite', 'T') == 'F':
+            self.reply(412)
+            return
+        os.replace(local_path, destination_path)
+        self.reply(204 if existed else 201)
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(path) for name in names)
+
+# Scenarios (each runs in its own process so peak RSS and module state are per scenario)
+
+def destination_config(kind, work_dir):
+    if kind == 'local':
+        return {'type': 'local', 'path': os.path.join(work_dir, 'destination')}
+    if kind in ('smb', 'smb-stream'):
+        return {'type': 'smb', 'server': 'bench', 'share': 'Media', 'path': 'videos', 'username': 'bench', 'password': 'bench'}
+    if kind == 'webdav':
+        return {'type': 'webdav', 'url': WebDAVServer(os.path.join(work_dir, 'webdav')).url, 'path': 'videos', 'username': 'bench', 'password': 'bench'}
+    raise ValueError(f"unknown destination '{kind}'")
+
+def bench_config(scrape, scenario, work_dir):
+    general_config = scrape.load_config(os.path.join(SCRIPT_DIR, 'config.yaml'))
+    general_config['vpn'] = {'enabled': False}
+    general_config['sleep'] = {'between_videos': 0, 'between_pages': 0}
+    # Start every host at full speed; injected 429s still slow it down
+    general_config['rate_limit'] = dict(general_config.get('rate_limit', {}), initial_rate=1000, max_rate=1000, burst=50)
+    general_config.setdefault('parsing', {})['parser'] = scenario['parser']
+    general_config.setdefault('downloader', {})['engine'] = 'native' if scenario.get('engine') == 'native' else 'command'
+    # "webdav+local" is an ordered list of destinations
+    kinds = scenario.get('destination', 'local').split('+')
+    general_config.setdefault('streaming', {})['enabled'] = 'smb-stream' in kinds
+    general_config['download_destinations'] = [destination_config(kind, work_dir) for kind in kinds]
+    general_config.setdefault('destinations', {})['strategy'] = scenario.get('strategy', 'ordered')
+    return general_config
+
+def run_list_scenario(scrape, scenario, site_config, general_config):
+    list_scraper = site_config['scrapers']['list_scraper']
+    url = scenario['first_url']
+    pages = items = 0
+    page = 1
+    started = time.perf_counter()
+    while url:
+        soup = scrape.fetch_list_page(url, site_config, general_config, scenario['mode'], general_config.get('headers', {}))
+        elements = scrape.find_video_elements(soup, list_scraper, url) if soup is not None else None
+        if not elements:
+            break
+        for element in elements:
+            scrape.extract_data(element, list_scraper['video_item']['fields'])
+        pages += 1
+        items += len(elements)
+        url = scrape.find_next_page(soup, url, site_config, page, scenario['mode'], scenario['identifier'])
+        page += 1
+    elapsed = time.perf_counter() - started
+    return {'seconds': elapsed, 'pages': pages, 'items': items, 'pages_per_second': pages / elapsed}
+
+def run_extract_scenario(scrape, scenario, site_config, general_config):
+    list_scraper = site_config['scrapers']['list_scraper']
+    rounds = scenario['rounds']
+    list_html = scrape.session.get(scenario['first_url'], timeout=30).content
+    video_html = scrape.session.get(scenario['video_url'], timeout=30).content
+    strainer = scrape.get_list_strainer(list_scraper)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        soup = scrape.parse_html(list_html, strainer)
+    parse_seconds = time.perf_counter() - started
+
+    elements = scrape.find_video_elements(soup, list_scraper, scenario['first_url'])
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for element in elements:
+            scrape.extract_data(element, list_scraper['video_item']['fields'])
+    item_seconds = time.perf_counter() - started
+
+    video_soup = scrape.parse_html(video_html)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        scrape.extract_data(video_soup, site_config['scrapers']['video_scraper'])
+    video_seconds = time.perf_counter() - started
+
+    return {
+        'seconds': parse_seconds + item_seconds + video_seconds,
+        'items': len(elements) * rounds,
+        'parses_per_second': rounds / parse_seconds,
+        'items_per_second': len(elements) * rounds / item_seconds,
+        'video_extracts_per_second': rounds / video_seconds,
+    }
+
+def run_e2e_scenario(scrape, scenario, site_config, general_config):
+    workers = scenario['workers']
+    pipeline = None
+    if workers > 1:
+        adapter = scrape.requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers * 2)
+        scrape.session.mount('http://', adapter)
+        concurrency_config = general_config.get('concurrency', {})
+        pipeline = scrape.VideoPipeline(workers, concurrency_config.get('queue_size', 0), concurrency_config.get('per_host', 2))
+    started = time.perf_counter()
+    try:
+        scrape.run_job(scenario['site'], site_config, scenario['mode'], scenario['identifier'], general_config, headers=general_config.get('headers', {}), pipeline=pipeline)
+        if pipeline is not None:
+            pipeline.close()
+    finally:
+        scrape.close_smb_pools()
+    elapsed = time.perf_counter() - started
+    videos = scrape.metrics.counter_values('videos', 'status')
+    summary = scrape.metrics.summary()
+    return {
+        'seconds': elapsed,
+        'videos': videos,
+        'videos_per_second': videos.get('downloaded', 0) / elapsed,
+        'transfers': summary['transfers'],
+        'stages': summary['stages'],
+    }
+
+SCENARIO_RUNNERS = {'list': run_list_scenario, 'extract': run_extract_scenario, 'e2e': run_e2e_scenario}
+
+def run_child():
+    scenario = json.load(sys.stdin)
+    work_dir = tempfile.mkdtemp(prefix='smutscrape-bench-')
+    os.chdir(work_dir)
+    sys.path.insert(0, SCRIPT_DIR)
+    import scrape
+
+    logger.remove()
+    logger.add(sys.stderr, level='DEBUG' if scenario.get('verbose') else 'WARNING')
+    FakeSMBConnection.root = os.path.join(work_dir, 'smb')
+    scrape.SMBConnection = FakeSMBConnection
+
+    site_config = scenario['site_config']
+    general_config = bench_config(scrape, scenario, work_dir)
+    scrape.configure_parser(general_config)
+    scrape.configure_rate_limiter(general_config)
+    try:
+        result = SCENARIO_RUNNERS[scenario['kind']](scrape, scenario, site_config, general_config)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps(result))
+
+def run_scenario(scenario, server, verbose=False):
+    server.reset()
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], input=json.dumps(dict(scenario, verbose=verbose)),
+                             stdout=subprocess.PIPE, stderr=None if verbose else subprocess.PIPE, text=True, env=dict(os.environ, TQDM_DISABLE='1'))
+    if process.returncode != 0:
+        logger.error(f"Scenario {scenario['name']} failed:\n{(process.stderr or '').strip()[-2000:]}")
+        return None
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['server'] = dict(server.stats)
+    return result
+
+# Setup
+
+def localize_site_config(site_config, base_url):
+    # Point every URL in the site config (base_url, absolute pagination patterns) at the local server
+    domain = re.escape(site_config['domain'])
+    text = re.sub(rf"https?://(?:www\.)?{domain}", base_url, json.dumps(site_config))
+    return json.loads(text)
+
+def list_mode(site_config):
+    for mode, mode_config in site_config['modes'].items():
+        if mode_config.get('scraper') == 'list_scraper' and re.fullmatch(r"[^{}]*\{" + re.escape(mode) + r"\}[^{}]*", mode_config['url_pattern']):
+            return mode
+    return None
+
+def check_fixture(scrape, fixture, site_config, mode):
+    list_scraper = site_config['scrapers']['list_scraper']
+    soup = scrape.parse_html(fixture.list_page(1), scrape.get_list_strainer(list_scraper))
+    elements = scrape.find_video_elements(soup, list_scraper, fixture.base_url)
+    if not elements or len(elements) != fixture.items:
+        raise ValueError(f"list fixture yields {len(elements or [])} of {fixture.items} items")
+    if 'url' not in scrape.extract_data(elements[0], list_scraper['video_item']['fields']):
+        raise ValueError("list items have no url")
+    video_data = scrape.extract_data(scrape.parse_html(fixture.video_page('1-0')), site_config['scrapers']['video_scraper'])
+    if not video_data.get('title') or not video_data.get('download_url'):
+        raise ValueError("video fixture yields no title or download_url")
+
+def prepare_site(scrape, site, args):
+    try:
+        site_config = scrape.load_site_config(site)
+        if site_config.get('selector_style', 'css') != 'css':
+            raise ValueError(f"{site_config['selector_style']} selectors are not supported")
+        mode = list_mode(site_config)
+        if mode is None:
+            raise ValueError("no single-identifier list mode")
+        fixture = SiteFixture(site, site_config, args.pages, args.items, args.media_kb * 1024)
+        server = FixtureServer(fixture, args.latency / 1000, args.throttle, args.seed)
+        site_config = localize_site_config(site_config, server.base_url)
+        fixture.site_config = site_config
+        identifier = 'bench'
+        first_url = scrape.construct_url(site_config['base_url'], site_config['modes'][mode]['url_pattern'], site_config, **{mode: identifier})
+        page_urls = {1: first_url}
+        if 'subsequent_pages' in site_config['scrapers']['list_scraper'].get('pagination', {}):
+            for page in range(1, args.pages + 1):
+                page_urls[page + 1] = scrape.find_next_page(None, first_url, site_config, page, mode, identifier)
+        fixture.bind(server.base_url, page_urls)
+        check_fixture(scrape, fixture, site_config, mode)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Skipping {site}: {e}")
+        return None
+    return {'site': site, 'site_config': site_config, 'mode': mode, 'identifier': identifier, 'first_url': first_url,
+            'video_url': f"{server.base_url}/__video/1-0", 'server': server}
+
+def build_scenarios(prepared, args):
+    scenarios = []
+    for site in prepared:
+        base = {key: site[key] for key in ('site', 'site_config', 'mode', 'identifier', 'first_url', 'video_url')}
+        for parser in args.parsers:
+            if 'list' in args.scenarios:
+                scenarios.append(dict(base, kind='list', parser=parser, name=f"{site['site']}/list/{parser}"))
+            if 'extract' in args.scenarios:
+                scenarios.append(dict(base, kind='extract', parser=parser, rounds=args.extract_rounds, name=f"{site['site']}/extract/{parser}"))
+            if 'e2e' not in args.scenarios:
+                continue
+            for engine, destination, workers in itertools.product(args.engines, args.destinations, args.workers):
+                site_config = site['site_config']
+                uses_ytdlp = 'yt-dlp' in site_config['download']['command']
+                if engine == 'native' and uses_ytdlp:
+                    continue
+                if engine == 'ytdlp' and not uses_ytdlp:
+                    site_config = dict(site_config, download=dict(site_config['download'], command='yt-dlp -o "{destination_path}" "{url}"'))
+                scenarios.append(dict(base, site_config=site_config, kind='e2e', parser=parser, engine=engine, destination=destination, workers=workers, strategy=args.strategy,
+                                      name=f"{site['site']}/e2e/{parser}/{engine}/{destination}/w{workers}"))
+    return scenarios
+
+# Reporting
+
+def aggregate(runs):
+    # Median of repeated runs; peak RSS is the worst seen
+    result = dict(runs[-1])
+    for metric in THROUGHPUT_METRICS + ('seconds',):
+        if metric in result:
+            result[metric] = statistics.median(run[metric] for run in runs)
+    result['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    result['runs'] = len(runs)
+    return result
+
+def headline(result):
+    parts = [f"{result[metric]:.1f} {metric.replace('_per_second', '/s').replace('_', ' ')}" for metric in THROUGHPUT_METRICS if metric in result]
+    if 'videos' in result:
+        parts.append(', '.join(f"{count} {status}" for status, count in sorted(result['videos'].items())) or 'no videos')
+    parts.append(f"{result['peak_rss_mb']:.0f} MB peak RSS")
+    if result['server']['throttled']:
+        parts.append(f"{result['server']['throttled']} throttled")
+    return ', '.join(parts)
+
+def compare(results, baseline_path, max_regression, options):
+    with open(baseline_path, 'r') as file:
+        baseline_run = json.load(file)
+    baseline = {result['name']: result for result in baseline_run['results']}
+    for option in ('pages', 'items', 'media_kb', 'latency', 'throttle', 'seed', 'extract_rounds'):
+        if baseline_run['meta']['options'].get(option) != options[option]:
+            logger.warning(f"Baseline was run with {option}={baseline_run['meta']['options'].get(option)}, this run with {options[option]}")
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        before = baseline.get(result['name'])
+        if before is None:
+            print(f"  {result['name']}: no baseline")
+            continue
+        for metric in THROUGHPUT_METRICS + ('peak_rss_mb',):
+            if metric not in result or metric not in before or not before[metric]:
+                continue
+            change = (result[metric] - before[metric]) / before[metric] * 100
+            print(f"  {result['name']} {metric}: {before[metric]:.1f} -> {result[metric]:.1f} ({change:+.1f}%)")
+            if metric != 'peak_rss_mb' and max_regression is not None and change < -max_regression:
+                regressions.append(f"{result['name']} {metric} {change:+.1f}%")
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    return not regressions
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def main():
+    if '--child' in sys.argv:
+        run_child()
+        return
+
+    parser = argparse.ArgumentParser(description='Offline benchmark against a local stand-in for each configured site')
+    parser.add_argument('--sites', type=split_list, help='Comma-separated site configs to benchmark (default: every CSS config)')
+    parser.add_argument('--scenarios', type=split_list, default=['list', 'extract', 'e2e'], help='Comma-separated subset of list, extract, e2e')
+    parser.add_argument('--pages', type=int, default=5, help='List pages per site')
+    parser.add_argument('--items', type=int, default=20, help='Videos per list page')
+    parser.add_argument('--media-kb', type=int, default=256, help='Size of each dummy video file in KB')
+    parser.add_argument('--parsers', type=split_list, help='Comma-separated HTML parsers to compare (default: parsing.parser from config.yaml)')
+    parser.add_argument('--engines', type=split_list, default=['command'], help='Comma-separated download engines for e2e: command, native, ytdlp')
+    parser.add_argument('--destinations', type=split_list, default=['local'], help="Comma-separated destinations for e2e: local, smb, smb-stream, webdav, or an ordered list like webdav+local")
+    parser.add_argument('--strategy', default='ordered', help='Destination strategy for e2e: ordered or throughput')
+    parser.add_argument('--workers', type=lambda value: [int(item) for item in split_list(value)], default=[1], help='Comma-separated worker counts for e2e')
+    parser.add_argument('--latency', type=float, default=0, help='Milliseconds the local server waits before answering each request')
+    parser.add_argument('--throttle', type=float, default=0, help='Fraction of requests answered with 429 Too Many Requests')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the 429 injection')
+    parser.add_argument('--extract-rounds', type=int, default=50, help='Times each page is parsed and extracted in the extract scenario')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per scenario; the median is reported')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a previous --output file')
+    parser.add_argument('--max-regression', type=float, help='With --compare, exit 1 if any throughput drops by more than this percentage')
+    parser.add_argument('--verbose', action='store_true', help="Show the scraper's own logging")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPT_DIR)
+    import scrape
+    logger.remove()
+    logger.add(sys.stderr, level='INFO')
+
+    general_config = scrape.load_config(os.path.join(SCRIPT_DIR, 'config.yaml'))
+    args.parsers = args.parsers or [general_config.get('parsing', {}).get('parser', 'lxml')]
+    scrape.configure_parser(general_config)
+    sites = args.sites or sorted(os.path.splitext(name)[0] for name in os.listdir(CONFIGS_DIR) if name.endswith(('.yaml', '.yml')))
+
+    prepared = [site for site in (prepare_site(scrape, site, args) for site in sites) if site is not None]
+    if not prepared:
+        logger.error("No site could be benchmarked.")
+        sys.exit(1)
+    servers = {site['site']: site.pop('server') for site in prepared}
+
+    results = []
+    try:
+        for scenario in build_scenarios(prepared, args):
+            runs = []
+            for _ in range(args.repeat):
+                run = run_scenario(scenario, servers[scenario['site']], args.verbose)
+                if run is not None:
+                    runs.append(run)
+            if not runs:
+                continue
+            result = dict(aggregate(runs), name=scenario['name'], site=scenario['site'], kind=scenario['kind'],
+                          **{key: scenario[key] for key in ('parser', 'engine', 'destination', 'workers') if key in scenario})
+            results.append(result)
+            logger.info(f"{result['name']}: {headline(result)}")
+    finally:
+        for server in servers.values():
+            server.close()
+
+    options = {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'max_regression', 'verbose')}
+    if args.output:
+        meta = {'revision': git_revision(), 'python': sys.version.split()[0], 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'options': options}
+        with open(args.output, 'w') as file:
+            json.dump({'meta': meta, 'results': results}, file, indent=2)
+        logger.info(f"Results written to {args.output}")
+    if args.compare and not compare(results, args.compare, args.max_regression, options):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 import argparse
 import yaml
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import os
 import subprocess
 import time
@@ -11,26 +11,330 @@ import re
 import sys
 import urllib.parse
 from smb.SMBConnection import SMBConnection
+from smb.smb_structs import OperationFailure
+from smb.base import NotConnectedError, NotReadyError, SMBTimeout
 import random
 from loguru import logger
 from tqdm import tqdm
-import io
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
 import shlex
+import io
 import json
+import queue
+import threading
+import tempfile
+import sqlite3
+import socket
+import hashlib
+import zlib
+import email.utils
+import shutil
+import xml.etree.ElementTree as ElementTree
+import cProfile
+import pstats
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 CONFIG_DIR = os.path.join(SCRIPT_DIR, 'configs')
+STATE_DIR = os.path.join(SCRIPT_DIR, 'state')
 
-last_vpn_action_time = 0
+vpn_rotator = None
 session = requests.Session()
+smb_pools = {}
+smb_pools_lock = threading.Lock()
+history = None
+checkpoints = None
+response_cache = None
+ytdlp_engines = {}
+ytdlp_engines_lock = threading.Lock()
+html_parser = "html.parser"
+extraction_plans = {}
+list_strainers = {}
+destination_sets = {}
+destination_sets_lock = threading.Lock()
+rate_limiter = None
+job_queue = None
 
 def load_config(config_file):
     with open(config_file, 'r') as file:
         return yaml.safe_load(file)
 
+def validate_site_config(site_config):
+    problems = [f"missing '{key}'" for key in ('base_url', 'modes', 'scrapers', 'download') if key not in (site_config or {})]
+    if problems:
+        return problems
+    for mode, mode_config in site_config['modes'].items():
+        if 'url_pattern' not in (mode_config or {}):
+            problems.append(f"mode '{mode}' has no url_pattern")
+    if 'video_scraper' not in site_config['scrapers']:
+        problems.append("missing 'scrapers.video_scraper'")
+    if any(mode != 'video' for mode in site_config['modes']) and 'list_scraper' not in site_config['scrapers']:
+        problems.append("list modes without 'scrapers.list_scraper'")
+    return problems
+
+def strip_www(host):
+    return host[4:] if host.startswith('www.') else host
+
+class SiteRegistry:
+    def __init__(self, config_dir=CONFIG_DIR, cache_path=os.path.join(STATE_DIR, 'sites.json')):
+        self.config_dir = config_dir
+        self.cache_path = cache_path
+        self.sites = {}
+        self.domains = {}
+        self._load()
+        self._index()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(entries, file)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.debug(f"Could not write site config cache: {e}")
+
+    def _load(self):
+        # Parsed configs are cached as JSON and reused while the YAML file's mtime is unchanged
+        cache = self._read_cache()
+        entries = {}
+        for file_name in sorted(os.listdir(self.config_dir)):
+            if not file_name.endswith('.yaml'):
+                continue
+            site = file_name[:-5]
+            config_path = os.path.join(self.config_dir, file_name)
+            mtime = os.stat(config_path).st_mtime_ns
+            cached = cache.get(site)
+            if cached and cached.get('mtime') == mtime:
+                site_config = cached['config']
+            else:
+                try:
+                    site_config = load_config(config_path)
+                except yaml.YAMLError as e:
+                    logger.warning(f"Skipping site config '{site}': {e}")
+                    continue
+            entries[site] = {'mtime': mtime, 'config': site_config}
+
+            problems = validate_site_config(site_config)
+            if problems:
+                logger.warning(f"Skipping site config '{site}': {', '.join(problems)}")
+                continue
+            self.sites[site] = site_config
+
+        if entries != cache:
+            self._write_cache(entries)
+
+    def _index(self):
+        for site, site_config in self.sites.items():
+            base = urllib.parse.urlparse(site_config['base_url'])
+            hosts = {strip_www((base.hostname or '').lower())}
+            if site_config.get('domain'):
+                hosts.add(strip_www(site_config['domain'].lower()))
+            for host in hosts:
+                if host:
+                    self.domains.setdefault(host, []).append((site, base.path.rstrip('/')))
+
+    def get(self, site):
+        if site not in self.sites:
+            raise KeyError(f"No valid site config named '{site}' in {self.config_dir}")
+        return self.sites[site]
+
+    def resolve(self, url):
+        parsed = urllib.parse.urlparse(url)
+        host = strip_www((parsed.hostname or '').lower())
+        # Walk up the domain so subdomains such as m.example.com resolve to example.com
+        labels = host.split('.')
+        for i in range(len(labels) - 1):
+            candidates = self.domains.get('.'.join(labels[i:]))
+            if not candidates:
+                continue
+            matches = [(len(path), site) for site, path in candidates if parsed.path.startswith(path)]
+            if matches:
+                site = max(matches)[1]
+                return site, self.sites[site]
+        return None, None
+
+    def by_key(self, key):
+        # Sites stored under this history/queue key; configs for different paths of one domain share it
+        return [(site, site_config) for site, site_config in self.sites.items() if site_key(site_config) == key]
+
+registry = None
+class Metrics:
+    LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = Counter()
+        self.requests = {}
+        self.transfers = {}
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def observe_stage(self, stage, seconds):
+        with self.lock:
+            calls, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+    def count(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe_request(self, host, seconds, status):
+        with self.lock:
+            stats = self.requests.setdefault(host, {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.LATENCY_BUCKETS), 'statuses': Counter()})
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['statuses'][str(status)] += 1
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+
+    def observe_transfer(self, downloader, size, seconds):
+        with self.lock:
+            transferred, elapsed, files = self.transfers.get(downloader, (0, 0.0, 0))
+            self.transfers[downloader] = (transferred + size, elapsed + seconds, files + 1)
+
+    def counter_values(self, name, label):
+        with self.lock:
+            return {dict(labels).get(label): value for (counter, labels), value in self.counters.items() if counter == name}
+
+    def summary(self):
+        with self.lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                key = ','.join(f"{k}={v}" for k, v in labels) or 'total'
+                counters.setdefault(name, {})[key] = value
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'stages': {stage: {'calls': calls, 'seconds': round(total, 3), 'mean_seconds': round(total / calls, 4), 'max_seconds': round(longest, 3)}
+                           for stage, (calls, total, longest) in sorted(self.stages.items())},
+                'requests': {host: {'count': stats['count'], 'seconds': round(stats['sum'], 3), 'statuses': dict(stats['statuses']),
+                                    'latency_buckets': dict(zip((str(bound) for bound in self.LATENCY_BUCKETS), stats['buckets']))}
+                             for host, stats in sorted(self.requests.items())},
+                'transfers': {downloader: {'files': files, 'bytes': transferred, 'seconds': round(elapsed, 3),
+                                           'bytes_per_second': round(transferred / elapsed) if elapsed else None}
+                              for downloader, (transferred, elapsed, files) in sorted(self.transfers.items())},
+                'counters': counters,
+            }
+
+    def prometheus(self):
+        def label_text(labels):
+            return '{' + ','.join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels) + '}' if labels else ''
+
+        lines = []
+        with self.lock:
+            lines.append(f"smutscrape_elapsed_seconds {time.time() - self.started:.3f}")
+            for stage, (calls, total, longest) in sorted(self.stages.items()):
+                lines.append(f'smutscrape_stage_calls_total{{stage="{stage}"}} {calls}')
+                lines.append(f'smutscrape_stage_seconds_total{{stage="{stage}"}} {total:.6f}')
+            for host, stats in sorted(self.requests.items()):
+                for bound, count in zip(self.LATENCY_BUCKETS, stats['buckets']):
+                    lines.append(f'smutscrape_request_duration_seconds_bucket{{host="{host}",le="{bound}"}} {count}')
+                lines.append(f'smutscrape_request_duration_seconds_bucket{{host="{host}",le="+Inf"}} {stats["count"]}')
+                lines.append(f'smutscrape_request_duration_seconds_sum{{host="{host}"}} {stats["sum"]:.6f}')
+                lines.append(f'smutscrape_request_duration_seconds_count{{host="{host}"}} {stats["count"]}')
+                for status, count in sorted(stats['statuses'].items()):
+                    lines.append(f'smutscrape_responses_total{{host="{host}",status="{status}"}} {count}')
+            for downloader, (transferred, elapsed, files) in sorted(self.transfers.items()):
+                lines.append(f'smutscrape_transfer_bytes_total{{downloader="{downloader}"}} {transferred}')
+                lines.append(f'smutscrape_transfer_seconds_total{{downloader="{downloader}"}} {elapsed:.6f}')
+                lines.append(f'smutscrape_transfer_files_total{{downloader="{downloader}"}} {files}')
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"smutscrape_{name}_total{label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def write_atomically(path, text):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+def start_prometheus_writer(path, interval):
+    def write_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_atomically(path, metrics.prometheus())
+            except OSError as e:
+                logger.warning(f"Could not write Prometheus textfile {path}: {e}")
+    threading.Thread(target=write_loop, name='prometheus', daemon=True).start()
+
+metrics = Metrics()
+profilers = []
+profilers_lock = threading.Lock()
+profiling = False
+profiler_shared = False
+
+def start_thread_profiler():
+    if not profiling:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Python 3.12+ allows only one active profiler per process; it already sees this thread's calls
+        global profiler_shared
+        if not profiler_shared:
+            profiler_shared = True
+            logger.warning(f"Cannot start per-thread profilers ({e}); worker threads are covered by the main profiler")
+        return None
+    return profiler
+
+def stop_thread_profiler(profiler):
+    if profiler is not None:
+        profiler.disable()
+        with profilers_lock:
+            profilers.append(profiler)
+
+def write_profile(path):
+    with profilers_lock:
+        stats = None
+        for profiler in profilers:
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+    if stats is None:
+        return
+    stats.dump_stats(path)
+    logger.info(f"Profile written to {path} (view with: python -m pstats {path})")
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats('cumulative').print_stats(25)
+    logger.debug(output.getvalue())
+
+def count_result(status):
+    metrics.count('videos', status=status)
+    return status
+
+def get_registry():
+    global registry
+    if registry is None:
+        registry = SiteRegistry()
+    return registry
+
 def load_site_config(site):
-    config_path = os.path.join(CONFIG_DIR, f'{site}.yaml')
-    return load_config(config_path)
+    return get_registry().get(site)
 
 def process_title(title, invalid_chars):
     for char in invalid_chars:
@@ -60,68 +364,969 @@ def construct_url(base_url, pattern, site_config, **kwargs):
     return urllib.parse.urljoin(base_url, path)
 
 
-def fetch_page(url, user_agents, headers):
+def site_key(site_config):
+    return site_config.get('domain') or urllib.parse.urlparse(site_config['base_url']).netloc
+
+def canonical_url(url):
+    parts = urllib.parse.urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return urllib.parse.urlunsplit(('https', host, parts.path.rstrip('/') or '/', parts.query, ''))
+
+class DownloadHistory:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS videos (
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                video_key TEXT,
+                title TEXT,
+                size INTEGER,
+                destination TEXT,
+                status TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (site, url))""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS videos_by_key ON videos (site, video_key)")
+
+    def is_known(self, site, url=None, video_key=None):
+        # Only completed videos count; failures are retried on the next run
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM videos WHERE site = ? AND (url = ? OR video_key = ?) AND status IN ('downloaded', 'exists') LIMIT 1",
+                (site, canonical_url(url) if url else None, video_key)
+            ).fetchone()
+        return row is not None
+
+    def record(self, site, url, status, video_key=None, title=None, size=None, destination=None):
+        with self.lock, self.db:
+            self.db.execute(
+                """INSERT INTO videos (site, url, video_key, title, size, destination, status, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (site, url) DO UPDATE SET
+                    video_key = COALESCE(excluded.video_key, video_key),
+                    title = COALESCE(excluded.title, title),
+                    size = COALESCE(excluded.size, size),
+                    destination = COALESCE(excluded.destination, destination),
+                    status = excluded.status,
+                    updated = excluded.updated""",
+                (site, canonical_url(url), video_key, title, size, destination, status, time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def record_history(site_config, url, status, **kwargs):
+    if history is not None:
+        history.record(site_key(site_config), url, status, **kwargs)
+
+class CrawlCheckpoints:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS crawls (
+                site TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                url TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (site, mode, identifier))""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS crawl_videos (
+                site TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                url TEXT NOT NULL,
+                PRIMARY KEY (site, mode, identifier, url))""")
+
+    def load(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT url, page FROM crawls WHERE site = ? AND mode = ? AND identifier = ?", key).fetchone()
+            videos = {url for (url,) in self.db.execute("SELECT url FROM crawl_videos WHERE site = ? AND mode = ? AND identifier = ?", key)}
+        return row, videos
+
+    def save_page(self, key, url, page):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO crawls (site, mode, identifier, url, page, updated) VALUES (?, ?, ?, ?, ?, ?)", (*key, url, page, time.time()))
+
+    def add_video(self, key, url):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO crawl_videos (site, mode, identifier, url) VALUES (?, ?, ?, ?)", (*key, url))
+
+    def clear(self, key):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM crawls WHERE site = ? AND mode = ? AND identifier = ?", key)
+            self.db.execute("DELETE FROM crawl_videos WHERE site = ? AND mode = ? AND identifier = ?", key)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class Crawl:
+    def __init__(self, checkpoints, site, mode, identifier, resume=False):
+        self.checkpoints = checkpoints
+        self.key = (site, mode, identifier)
+        self.url = None
+        self.page = 1
+        self.processed = set()
+        self.pending = 0
+        self.page_new = 0
+        self.page_known = 0
+        self.listing_done = False
+        # page number -> [url, videos not yet done or failed]; the current page stays until the next one starts
+        self.open_pages = {}
+        self.current_page = None
+        self.lock = threading.Lock()
+        if resume:
+            row, self.processed = checkpoints.load(self.key)
+            if row:
+                self.url, self.page = row
+        else:
+            checkpoints.clear(self.key)
+
+    def save_page(self, url, page):
+        with self.lock:
+            self.open_pages = {number: entry for number, entry in self.open_pages.items() if entry[1]}
+            self.open_pages[page] = [url, 0]
+            self.current_page = page
+            self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        # Resume from the oldest page that still has unfinished or failed videos, so none of them are skipped
+        url = self.open_pages[min(self.open_pages)][0]
+        self.checkpoints.save_page(self.key, url, min(self.open_pages))
+
+    def start_page(self):
+        self.page_new = 0
+        self.page_known = 0
+
+    def note_known(self):
+        self.page_known += 1
+
+    def is_processed(self, video_url):
+        with self.lock:
+            return canonical_url(video_url) in self.processed
+
+    def track(self, video_url):
+        # Returns the callback that marks the video done once its worker finishes
+        video = canonical_url(video_url)
+        with self.lock:
+            self.pending += 1
+            self.page_new += 1
+            page = self.current_page
+            if page in self.open_pages:
+                self.open_pages[page][1] += 1
+
+        def done(status):
+            # Failed videos are retried when the crawl is resumed, like the history does
+            completed = status not in ('failed', 'offline')
+            with self.lock:
+                if completed:
+                    self.processed.add(video)
+                self.pending -= 1
+                finished = self.listing_done and self.pending == 0
+                if completed and page in self.open_pages:
+                    self.open_pages[page][1] -= 1
+                    if not self.open_pages[page][1] and page != self.current_page:
+                        del self.open_pages[page]
+                        self._save_checkpoint()
+            if completed:
+                self.checkpoints.add_video(self.key, video)
+            if finished:
+                self.checkpoints.clear(self.key)
+        return done
+
+    def finish(self):
+        # The checkpoint is only dropped once every queued video has been processed
+        with self.lock:
+            self.listing_done = True
+            finished = self.pending == 0
+        if finished:
+            self.checkpoints.clear(self.key)
+
+class JobQueue:
+    # Video jobs shared by every node pointed at the same database (e.g. on a NAS mount).
+    # A claimed job is leased to its node; leases that are not renewed in time are re-queued.
+    def __init__(self, path, lease=600, max_attempts=3):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                site TEXT NOT NULL,
+                canonical_url TEXT NOT NULL,
+                url TEXT NOT NULL,
+                video_key TEXT,
+                overwrite INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                updated REAL NOT NULL,
+                UNIQUE (site, canonical_url))""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, id)")
+
+    def enqueue(self, site, url, video_key=None, overwrite=False):
+        # Jobs another node already queued or finished are left alone; failed ones get another chance
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                """INSERT INTO jobs (site, canonical_url, url, video_key, overwrite, status, updated)
+                VALUES (?, ?, ?, ?, ?, 'queued', ?)
+                ON CONFLICT (site, canonical_url) DO UPDATE SET
+                    status = 'queued', attempts = 0, overwrite = excluded.overwrite, updated = excluded.updated
+                WHERE status = 'failed' OR (status = 'done' AND excluded.overwrite = 1)""",
+                (site, canonical_url(url), url, video_key, int(overwrite), time.time())
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, owner):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            expired = self.db.execute(
+                """UPDATE jobs SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END,
+                    attempts = attempts + 1, owner = NULL, result = 'lease expired', updated = ?
+                WHERE status = 'leased' AND lease_until < ?""",
+                (self.max_attempts, now, now)
+            ).rowcount
+            row = self.db.execute("SELECT id, site, url, video_key, overwrite FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                self.db.execute("UPDATE jobs SET status = 'leased', owner = ?, lease_until = ?, updated = ? WHERE id = ?", (owner, now + self.lease, now, row[0]))
+        if expired:
+            logger.warning(f"Re-queued {expired} jobs whose lease expired")
+        return row
+
+    def renew(self, job_ids, owner):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                [(now + self.lease, job_id, owner) for job_id in job_ids]
+            )
+
+    def ack(self, job_id, owner, status):
+        # A job that lost its lease to another node is that node's to finish
+        with self.lock, self.db:
+            if status == 'failed':
+                self.db.execute(
+                    """UPDATE jobs SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END,
+                        attempts = attempts + 1, owner = NULL, result = ?, updated = ?
+                    WHERE id = ? AND owner = ? AND status = 'leased'""",
+                    (self.max_attempts, status, time.time(), job_id, owner)
+                )
+            else:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'done', owner = NULL, result = ?, updated = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                    (status, time.time(), job_id, owner)
+                )
+
+    def release(self, job_ids, owner):
+        # Hands unfinished jobs back without counting an attempt, e.g. when a node is interrupted
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL, updated = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                [(time.time(), job_id, owner) for job_id in job_ids]
+            )
+
+    def counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def describe_destination(destination_config):
+    if destination_config['type'] == 'smb':
+        return f"smb://{destination_config['server']}/{destination_config['share']}/{destination_config['path']}"
+    if destination_config['type'] == 'webdav':
+        return f"{destination_config['url'].rstrip('/')}/{destination_config['path'].strip('/')}"
+    return destination_config['path']
+
+class ResponseCache:
+    def __init__(self, path, ttls=None, max_size_mb=512, offline=False):
+        self.path = path
+        self.ttls = ttls or {}
+        self.max_size = max_size_mb * 1024 * 1024
+        self.offline = offline
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.total_size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.path, f"{key}.json"), os.path.join(self.path, f"{key}.z")
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, self.ttls.get('default', 0))
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                body = zlib.decompress(file.read())
+            os.utime(body_path)  # Mark as recently used for LRU eviction
+            return meta, body
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def _write(self, path, data):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def put(self, url, response):
+        meta_path, body_path = self._paths(url)
+        body = zlib.compress(response.content)
+        meta = json.dumps({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched': time.time(),
+        }).encode()
+        with self.lock:
+            previous = sum(os.path.getsize(path) for path in (meta_path, body_path) if os.path.exists(path))
+            self._write(body_path, body)
+            self._write(meta_path, meta)
+            self.total_size += len(body) + len(meta) - previous
+            if self.total_size > self.max_size:
+                self._evict()
+
+    def revalidated(self, url, meta):
+        meta_path, _ = self._paths(url)
+        meta['fetched'] = time.time()
+        with self.lock:
+            self._write(meta_path, json.dumps(meta).encode())
+
+    def _evict(self):
+        # Drop least recently used bodies (and their metadata) until under 90% of the limit
+        bodies = sorted((entry for entry in os.scandir(self.path) if entry.name.endswith('.z')), key=lambda entry: entry.stat().st_mtime)
+        for entry in bodies:
+            if self.total_size <= self.max_size * 0.9:
+                break
+            meta_path = entry.path[:-2] + '.json'
+            for path in (entry.path, meta_path):
+                try:
+                    self.total_size -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def configure_response_cache(general_config, offline=False):
+    global response_cache
+    cache_config = general_config.get('http_cache', {})
+    if not (cache_config.get('enabled', False) or offline):
+        return
+    path = os.path.join(SCRIPT_DIR, os.path.expanduser(cache_config.get('path', os.path.join(STATE_DIR, 'http_cache'))))
+    response_cache = ResponseCache(path, cache_config.get('ttl', {}), cache_config.get('max_size_mb', 512), offline)
+    if offline:
+        logger.info(f"Offline mode: serving pages only from {path}")
+
+class HostLimiter:
+    # Token bucket whose rate grows additively while the host answers quickly
+    # and shrinks multiplicatively on 429/503 or slow responses
+    def __init__(self, host, config):
+        self.host = host
+        self.config = config
+        self.rate = config['initial_rate']
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.last_decrease = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.config['burst'], self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait * random.uniform(1, 1.2))
+
+    def interval(self):
+        with self.lock:
+            return 1 / self.rate
+
+    def succeeded(self, latency, sent=None):
+        with self.lock:
+            if latency > self.config['slow_latency']:
+                if self._slow_down(sent):
+                    logger.debug(f"{self.host} answered in {latency:.1f}s. Slowing to {self.rate:.2f} req/s")
+            else:
+                self.rate = min(self.config['max_rate'], self.rate + self.config['increase'])
+
+    def throttled(self, retry_after=None, sent=None):
+        # retry_after is only the server's Retry-After; without one the host is slowed down, not blocked
+        with self.lock:
+            self._slow_down(sent)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            return self.rate
+
+    def _slow_down(self, sent=None):
+        # One decrease per congestion event: answers to requests sent before the last decrease
+        # (or, without a send time, within one interval of it) were already accounted for
+        now = time.monotonic()
+        if sent is not None and sent < self.last_decrease or sent is None and now - self.last_decrease < 1 / self.rate:
+            return False
+        self.rate = max(self.config['min_rate'], self.rate * self.config['decrease'])
+        self.last_decrease = now
+        self._refill(now)
+        self.tokens = min(self.tokens, 0)
+        return True
+
+class RateLimiter:
+    DEFAULTS = {'initial_rate': 0.5, 'min_rate': 0.05, 'max_rate': 4, 'burst': 2, 'increase': 0.1, 'decrease': 0.5,
+                'slow_latency': 5, 'retries': 4, 'backoff': 2, 'max_backoff': 120}
+
+    def __init__(self, config=None):
+        self.config = dict(self.DEFAULTS, **(config or {}))
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def host(self, url):
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host, self.config)
+            return self.hosts[host]
+
+    def backoff(self, attempt):
+        return min(self.config['max_backoff'], self.config['backoff'] * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def reset(self):
+        # Throttling learned on the previous VPN exit no longer applies
+        with self.lock:
+            self.hosts.clear()
+
+def configure_rate_limiter(general_config):
+    global rate_limiter
+    rate_limiter = RateLimiter(general_config.get('rate_limit'))
+
+def get_rate_limiter():
+    global rate_limiter
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+    return rate_limiter
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def polite_get(url, headers):
+    # GET through the host's rate limiter, retrying 429/5xx and connection errors with jittered exponential backoff
+    limiter = get_rate_limiter()
+    host_limiter = limiter.host(url)
+    retries = limiter.config['retries']
+    host = urllib.parse.urlparse(url).netloc
+    for attempt in range(retries + 1):
+        with metrics.timer('sleep'):
+            host_limiter.acquire()
+        sent = time.monotonic()
+        started = time.perf_counter()
+        try:
+            with get_vpn_rotator().slot():
+                response = session.get(url, headers=headers, timeout=30)
+            get_vpn_rotator().observe(response)
+        except requests.exceptions.RequestException as e:
+            metrics.observe_request(host, time.perf_counter() - started, 'error')
+            if attempt == retries:
+                raise
+            delay = limiter.backoff(attempt)
+            logger.warning(f"Request to {url} failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{retries})...")
+        else:
+            latency = time.perf_counter() - started
+            metrics.observe_request(host, latency, response.status_code)
+            metrics.observe_stage('fetch', latency)
+            if response.status_code not in (429, 500, 502, 503, 504):
+                host_limiter.succeeded(latency, sent)
+                return response
+            delay = limiter.backoff(attempt)
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None:
+                    delay = min(retry_after, limiter.config['max_backoff'])
+                    retry_after = delay
+                rate = host_limiter.throttled(retry_after, sent)
+                metrics.count('throttled', host=host)
+                logger.warning(f"{host} answered {response.status_code}. Slowing to {rate:.2f} req/s")
+            if attempt == retries:
+                return response
+            logger.warning(f"Got {response.status_code} for {url}. Retrying in {delay:.1f}s ({attempt + 1}/{retries})...")
+        metrics.count('retries', stage='fetch')
+        time.sleep(delay)
+
+def pause(general_config, key, url):
+    # sleep.between_* are ceilings (or floors) on the host's current request interval
+    sleep_config = general_config['sleep']
+    seconds = sleep_config[key]
+    policy = sleep_config.get('policy', 'ceiling')
+    if policy != 'fixed':
+        interval = get_rate_limiter().host(url).interval()
+        seconds = min(seconds, interval) if policy == 'ceiling' else max(seconds, interval)
+    if seconds > 0:
+        with metrics.timer('sleep'):
+            time.sleep(seconds)
+
+def parse_html(content, parse_only=None):
+    with metrics.timer('parse'):
+        return BeautifulSoup(content, html_parser, parse_only=parse_only)
+
+def fetch_page(url, user_agents, headers, parse_only=None, kind='default'):
+    cached = response_cache.get(url) if response_cache is not None else None
+    if cached is not None:
+        meta, body = cached
+        if response_cache.offline or time.time() - meta['fetched'] < response_cache.ttl(kind):
+            logger.debug(f"Serving {url} from cache")
+            metrics.count('cache', result='hit')
+            return parse_html(body, parse_only)
+    elif response_cache is not None and response_cache.offline:
+        logger.error(f"Offline mode: {url} is not in the cache")
+        return None
+
     if 'User-Agent' not in headers:
         headers['User-Agent'] = random.choice(user_agents)
+    request_headers = dict(headers)
+    if cached is not None:
+        if meta.get('etag'):
+            request_headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            request_headers['If-Modified-Since'] = meta['last_modified']
     logger.debug(f"Fetching URL: {url}")
-    logger.debug(f"Using headers: {headers}")
-    time.sleep(random.uniform(1, 3))  # Random delay between requests
+    logger.debug(f"Using headers: {request_headers}")
     try:
-        response = session.get(url, headers=headers, timeout=30)
+        response = polite_get(url, request_headers)
+        if cached is not None and response.status_code == 304:
+            logger.debug(f"Not modified, serving {url} from cache")
+            metrics.count('cache', result='revalidated')
+            response_cache.revalidated(url, meta)
+            return parse_html(body, parse_only)
         response.raise_for_status()
-        return BeautifulSoup(response.content, "html.parser")
+        if response_cache is not None:
+            metrics.count('cache', result='miss')
+            response_cache.put(url, response)
+        return parse_html(response.content, parse_only)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching {url}: {e}")
         return None
 
-def extract_data(soup, selectors):
-    data = {}
-    for field, config in selectors.items():
-        logger.debug(f"Extracting field: {field}")
-        logger.debug(f"Config: {config}")
-        if isinstance(config, str):
-            elements = soup.select(config)
-        elif isinstance(config, dict):
-            if 'selector' in config:
-                elements = soup.select(config['selector'])
-            elif 'attribute' in config:
+def configure_parser(general_config):
+    global html_parser
+    parser = general_config.get('parsing', {}).get('parser', 'html.parser')
+    if parser == 'lxml':
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            logger.warning("lxml is not installed. Falling back to html.parser.")
+            parser = 'html.parser'
+    html_parser = parser
+
+SIMPLE_SELECTOR_REGEX = re.compile(r'^([a-zA-Z][\w-]*)?((?:[#.][\w-]+)*)$')
+
+class SelectorStrainer(SoupStrainer):
+    # Keeps only top-level tags matching the leading compound (tag#id.class) of any
+    # of the given CSS selectors, so list pages build a tree of just the parts we read.
+    def __init__(self, rules):
+        super().__init__()
+        self.rules = rules
+
+    def _matches(self, name, attrs):
+        attrs = attrs or {}
+        classes = attrs.get('class') or ''
+        if not isinstance(classes, str):
+            classes = ' '.join(classes)
+        classes = set(classes.split())
+        for tag, tag_id, tag_classes in self.rules:
+            if tag and tag != name:
+                continue
+            if tag_id and attrs.get('id') != tag_id:
+                continue
+            if not tag_classes <= classes:
+                continue
+            return True
+        return False
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self._matches(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        name = getattr(markup_name, 'name', markup_name)
+        attrs = getattr(markup_name, 'attrs', markup_attrs)
+        return markup_name if self._matches(name, dict(attrs)) else None
+
+    def search(self, markup):
+        if isinstance(markup, str):
+            return None
+        return super().search(markup)
+
+def compile_strainer(selectors):
+    rules = []
+    for selector in selectors:
+        if not selector:
+            continue
+        match = SIMPLE_SELECTOR_REGEX.match(selector.split()[0])
+        if not match or not (match.group(1) or match.group(2)):
+            return None
+        parts = re.findall(r'([#.])([\w-]+)', match.group(2))
+        tag_id = next((value for prefix, value in parts if prefix == '#'), None)
+        tag_classes = {value for prefix, value in parts if prefix == '.'}
+        rules.append((match.group(1) and match.group(1).lower(), tag_id, tag_classes))
+    return SelectorStrainer(rules) if rules else None
+
+def get_list_strainer(list_scraper):
+    key = id(list_scraper)
+    if key not in list_strainers:
+        selectors = list(list_scraper['video_container']['selector'])
+        next_page = list_scraper.get('pagination', {}).get('next_page', {})
+        if next_page.get('selector'):
+            selectors.append(next_page['selector'])
+        list_strainers[key] = (list_scraper, compile_strainer(selectors))
+    return list_strainers[key][1]
+
+class ExtractionPlan:
+    LIST_FIELDS = ('tags', 'genres', 'actors', 'producers')
+
+    def __init__(self, selectors):
+        self.selectors = selectors  # Held so the id()-keyed plan cache stays valid
+        self.fields = []
+        for field, config in selectors.items():
+            if isinstance(config, str):
+                self.fields.append((field, config, None, None, field in self.LIST_FIELDS))
+            elif isinstance(config, dict) and ('selector' in config or 'attribute' in config):
+                self.fields.append((field, config.get('selector'), config.get('attribute'), config.get('json_key'), field in self.LIST_FIELDS))
+
+    def extract(self, soup):
+        data = {}
+        for field, selector, attribute, json_key, multiple in self.fields:
+            if selector is None:
                 elements = [soup]
+            elif multiple:
+                elements = soup.select(selector)
             else:
-                elements = []
-        logger.debug(f"Found {len(elements)} elements")
-        if elements:
-            if isinstance(config, dict) and 'attribute' in config:
-                value = elements[0].get(config['attribute'])
-                if field == 'download_url':
-                    logger.debug(f"Download URL element: {elements[0]}")
-                    logger.debug(f"Download URL attributes: {elements[0].attrs}")
-            else:
-                value = elements[0].text.strip()
+                element = soup.select_one(selector)
+                elements = [element] if element is not None else []
+            if not elements:
+                continue
 
-            if isinstance(config, dict) and 'json_key' in config:
+            if multiple:
+                data[field] = [element.text.strip() for element in elements]
+                continue
+
+            value = elements[0].get(attribute) if attribute else elements[0].text.strip()
+            if json_key:
                 try:
-                    json_data = json.loads(value)
-                    value = json_data.get(config['json_key'])
+                    value = json.loads(value).get(json_key)
                 except json.JSONDecodeError:
                     logger.error(f"Failed to parse JSON for field {field}")
+            data[field] = value
+        return data
 
-            if field in ['tags', 'genres', 'actors', 'producers']:
-                value = [element.text.strip() for element in elements]
+def get_extraction_plan(selectors):
+    plan = extraction_plans.get(id(selectors))
+    if plan is None:
+        plan = extraction_plans[id(selectors)] = ExtractionPlan(selectors)
+    return plan
 
-            data[field] = value
-        logger.debug(f"Extracted data for {field}: {data.get(field)}")
+def extract_data(soup, selectors):
+    with metrics.timer('extract'):
+        data = get_extraction_plan(selectors).extract(soup)
+    logger.debug(f"Extracted data: {data}")
     return data
 
-def process_list_page(url, site_config, general_config, current_page=1, mode=None, identifier=None, overwrite_files=False, headers=None):
-    logger.info(f"Processing list page: {url}")
-    soup = fetch_page(url, general_config['user_agents'], headers)
-    if soup is None:
-        logger.error(f"Failed to fetch list page: {url}")
-        return None, None
+class VideoPipeline:
+    def __init__(self, workers, queue_size=0, per_host=2):
+        self.queue = queue.Queue(maxsize=max(queue_size, workers))
+        self.per_host = per_host
+        self.host_slots = {}
+        self.host_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f"worker-{i + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {workers} video workers (max {per_host} per host)")
+
+    def _host_slot(self, url):
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self.host_lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def submit(self, url, site_config, general_config, overwrite_files=False, headers=None, video_key=None, on_done=None):
+        # Block while the queue is full so list crawling never runs far ahead of the workers
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(((url, site_config, general_config, overwrite_files, headers, video_key), on_done), timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
+    def _run(self):
+        profiler = None
+        try:
+            profiler = start_thread_profiler()
+            self._worker()
+        finally:
+            stop_thread_profiler(profiler)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                if self.stop_event.is_set():
+                    continue
+                args, on_done = job
+                status = 'failed'
+                try:
+                    with self._host_slot(args[0]):
+                        status = process_video_page(*args)
+                finally:
+                    if on_done is not None:
+                        on_done(status)
+            except Exception as e:
+                logger.exception(f"Worker failed on {job[0][0]}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def cancel(self, timeout=30):
+        self.stop_event.set()
+        try:
+            while True:
+                self.queue.get_nowait()
+                self.queue.task_done()
+        except queue.Empty:
+            pass
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning(f"{thread.name} did not finish within {timeout}s")
+
+class QueueSubmitter:
+    # Stands in for a VideoPipeline: crawls add their videos to the shared job queue instead of processing them
+    def __init__(self, job_queue):
+        self.job_queue = job_queue
+
+    def submit(self, url, site_config, general_config, overwrite_files=False, headers=None, video_key=None, on_done=None):
+        if self.job_queue.enqueue(site_key(site_config), url, video_key, overwrite_files):
+            logger.info(f"Queued: {url}")
+            count_result('queued')
+        else:
+            logger.info(f"Already queued by another run: {url}")
+            count_result('known')
+        if on_done is not None:
+            on_done('queued')
+        return True
+
+class QueueWorker:
+    # Claims jobs from the shared queue and processes them, through the pipeline if there is one.
+    # Leases of running jobs are renewed in the background until they are acknowledged.
+    def __init__(self, job_queue, general_config, pipeline=None, workers=1, poll_interval=5):
+        self.job_queue = job_queue
+        self.general_config = general_config
+        self.pipeline = pipeline
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.free = threading.Semaphore(workers if pipeline is not None else 1)
+        self.active = set()
+        self.active_lock = threading.Lock()
+        self.crawling = True
+        self.idle_timeout = 0
+        self.stop_event = threading.Event()
+        self.heartbeat = threading.Thread(target=self._renew_leases, name='lease-heartbeat', daemon=True)
+        self.heartbeat.start()
+        self.feeder = threading.Thread(target=self._run, name='queue-feeder', daemon=True)
+        self.feeder.start()
+        logger.info(f"Working the shared job queue as {self.owner}")
+
+    def _renew_leases(self):
+        while not self.stop_event.wait(self.job_queue.lease / 3):
+            with self.active_lock:
+                job_ids = list(self.active)
+            if job_ids:
+                try:
+                    self.job_queue.renew(job_ids, self.owner)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to renew job leases: {e}")
+
+    def _run(self):
+        profiler = None
+        try:
+            profiler = start_thread_profiler()
+            self._feed()
+        finally:
+            stop_thread_profiler(profiler)
+
+    def _feed(self):
+        idle_since = None
+        while not self.stop_event.is_set():
+            self.free.acquire()
+            if self.stop_event.is_set():
+                return
+            try:
+                job = self.job_queue.claim(self.owner)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                self.free.release()
+                if self.crawling:
+                    idle_since = None
+                else:
+                    idle_since = idle_since or time.time()
+                    if self.idle_timeout is not None and time.time() - idle_since >= self.idle_timeout:
+                        return
+                self.stop_event.wait(self.poll_interval)
+                continue
+            idle_since = None
+            self._start(*job)
+
+    def _start(self, job_id, site, url, video_key, overwrite):
+        with self.active_lock:
+            self.active.add(job_id)
+
+        def done(status):
+            with self.active_lock:
+                self.active.discard(job_id)
+            try:
+                self.job_queue.ack(job_id, self.owner, status)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to acknowledge {url}: {e}")
+            self.free.release()
+
+        sites = get_registry().by_key(site) if site else []
+        if len(sites) == 1:
+            site_config = sites[0][1]
+        else:
+            # No config for the stored site here, or several share its domain: go by the URL
+            site_config = get_registry().resolve(url)[1]
+        if site_config is None:
+            logger.error(f"Unrecognized URL in job queue: {url}")
+            return done('failed')
+        headers = self.general_config.get('headers', {}).copy()
+        headers['User-Agent'] = random.choice(self.general_config['user_agents'])
+        if self.pipeline is not None:
+            if not self.pipeline.submit(url, site_config, self.general_config, bool(overwrite), headers, video_key, done):
+                done('failed')
+            return
+        status = 'failed'
+        try:
+            status = process_video_page(url, site_config, self.general_config, bool(overwrite), headers, video_key)
+        except Exception as e:
+            logger.exception(f"Failed on {url}: {e}")
+        finally:
+            done(status)
+
+    def finish(self, idle_timeout=0):
+        # Crawling is over: keep claiming until the queue has stayed empty for idle_timeout seconds (None waits forever)
+        self.idle_timeout = idle_timeout
+        self.crawling = False
+        while self.feeder.is_alive():
+            self.feeder.join(1)
+
+    def cancel(self):
+        # Stop claiming before the pipeline drops its queue so no job is claimed and then forgotten
+        self.stop_event.set()
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+
+    def close(self):
+        self.stop_event.set()
+        self.feeder.join(self.poll_interval + 1)
+        with self.active_lock:
+            job_ids = list(self.active)
+        if job_ids:
+            logger.info(f"Returning {len(job_ids)} unfinished jobs to the queue")
+            self.job_queue.release(job_ids, self.owner)
+
+class ListPrefetcher:
+    # Fetches upcoming list pages on a background thread while the current page's videos are processed
+    MISSING = object()
+
+    def __init__(self, fetch, depth=2, delay=None):
+        self.fetch = fetch
+        self.depth = depth
+        self.delay = delay or (lambda url: None)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self.futures = {}
+        self.exhausted = False
+        self.lock = threading.Lock()
+
+    def schedule(self, urls):
+        with self.lock:
+            for url in urls[:self.depth]:
+                if url not in self.futures and not self.exhausted:
+                    logger.debug(f"Prefetching list page: {url}")
+                    self.futures[url] = self.executor.submit(self._fetch, url)
+
+    def _fetch(self, url):
+        if self.exhausted:
+            return None
+        self.delay(url)
+        soup, has_items = self.fetch(url)
+        if not has_items:
+            # Nothing past an empty page is worth fetching
+            self.exhausted = True
+        return soup
+
+    def take(self, url):
+        with self.lock:
+            future = self.futures.pop(url, None)
+        if future is None:
+            return self.MISSING
+        return future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_list_page(url, site_config, general_config, mode=None, headers=None):
     list_scraper = site_config['scrapers']['list_scraper']
-    base_url = site_config['base_url']
+    return fetch_page(url, general_config['user_agents'], headers, get_list_strainer(list_scraper), mode or 'default')
 
+def find_video_elements(soup, list_scraper, url):
     logger.debug(f"Looking for video container with selector: {list_scraper['video_container']['selector']}")
     container = None
     for selector in list_scraper['video_container']['selector']:
@@ -132,41 +1337,21 @@ def process_list_page(url, site_config, general_config, current_page=1, mode=Non
 
     if not container:
         logger.error(f"Could not find the video results container. URL: {url}")
-        return None, None
+        return None
 
     logger.debug(f"Looking for video items with selector: {list_scraper['video_item']['selector']}")
     video_elements = container.select(list_scraper['video_item']['selector'])
     logger.debug(f"Found {len(video_elements)} video elements")
+    return video_elements
 
-    if len(video_elements) == 0:
-        logger.info(f"No video elements found on page {current_page}. Aborting pagination.")
-        return None, None
-
-    for video_element in video_elements:
-        logger.debug(f"Processing video element: {video_element}")
-        video_data = extract_data(video_element, list_scraper['video_item']['fields'])
-        logger.debug(f"Extracted video data: {video_data}")
-
-        if 'url' in video_data:
-            video_url = video_data['url']
-            if not video_url.startswith(('http://', 'https://')):
-                video_url = f"http:{video_url}" if video_url.startswith('//') else urllib.parse.urljoin(base_url, video_url)
-        elif 'video_key' in video_data:
-            video_url = construct_url(base_url, site_config['modes']['video']['url_pattern'], site_config, video_id=video_data['video_key'])
-        else:
-            logger.warning("Unable to construct video URL. Skipping.")
-            continue
-
-        video_title = video_data.get('title', '') or video_element.text.strip()
-
-        logger.info(f"Found video: {video_title} - {video_url}")
-        process_video_page(video_url, site_config, general_config, overwrite_files, headers)
-
+def find_next_page(soup, url, site_config, current_page, mode=None, identifier=None, ahead=1):
+    list_scraper = site_config['scrapers']['list_scraper']
+    base_url = site_config['base_url']
     logger.debug("Looking for next page")
     pagination_config = list_scraper.get('pagination', {})
     max_pages = pagination_config.get('max_pages', float('inf'))
 
-    if current_page < max_pages:
+    if current_page + ahead - 1 < max_pages:
         logger.debug(f"Current page: {current_page}")
         logger.debug(f"Pagination config: {pagination_config}")
         logger.debug(f"Mode: {mode}")
@@ -192,12 +1377,15 @@ def process_list_page(url, site_config, general_config, current_page=1, mode=Non
         if 'subsequent_pages' in pagination_config:
             next_url = pagination_config['subsequent_pages'].format(
                 url_pattern=url_pattern,
-                page=current_page + 1,
+                page=current_page + ahead,
                 search=encoded_identifier
             )
-        else:
+        elif ahead == 1:
             next_page = soup.select_one(pagination_config.get('next_page', {}).get('selector', ''))
             next_url = next_page.get(pagination_config.get('next_page', {}).get('attribute', '')) if next_page else None
+        else:
+            # Only predictable page URLs can be computed more than one page ahead
+            return None
 
         logger.debug(f"Constructed next URL: {next_url}")
 
@@ -205,98 +1393,407 @@ def process_list_page(url, site_config, general_config, current_page=1, mode=Non
             logger.debug(f"Found next page URL: {next_url}")
             if not next_url.startswith(('http://', 'https://')):
                 next_url = urllib.parse.urljoin(base_url, next_url)
-            return next_url, current_page + 1
+            return next_url
 
     logger.debug("No next page found or reached maximum pages")
+    return None
+
+# Returned by process_list_page instead of the next URL when the crawl stopped early (fetch failed or interrupted)
+LIST_FAILED = object()
+
+def process_list_page(url, site_config, general_config, current_page=1, mode=None, identifier=None, overwrite_files=False, headers=None, pipeline=None, crawl=None, prefetcher=None):
+    logger.info(f"Processing list page: {url}")
+    list_scraper = site_config['scrapers']['list_scraper']
+    base_url = site_config['base_url']
+
+    soup = prefetcher.take(url) if prefetcher is not None else ListPrefetcher.MISSING
+    if soup is ListPrefetcher.MISSING:
+        soup = fetch_list_page(url, site_config, general_config, mode, headers)
+    if soup is None:
+        logger.error(f"Failed to fetch list page: {url}")
+        return LIST_FAILED, None
+
+    video_elements = find_video_elements(soup, list_scraper, url)
+    if video_elements is None:
+        return None, None
+
+    if len(video_elements) == 0:
+        logger.info(f"No video elements found on page {current_page}. Aborting pagination.")
+        return None, None
+
+    # The next page is known before this page's videos are processed, so it can be fetched meanwhile
+    next_url = find_next_page(soup, url, site_config, current_page, mode, identifier)
+    if prefetcher is not None and next_url:
+        upcoming = [next_url]
+        for ahead in range(2, prefetcher.depth + 1):
+            upcoming_url = find_next_page(soup, url, site_config, current_page, mode, identifier, ahead)
+            if not upcoming_url:
+                break
+            upcoming.append(upcoming_url)
+        prefetcher.schedule(upcoming)
+
+    if crawl is not None:
+        crawl.start_page()
+    for video_element in video_elements:
+        logger.opt(lazy=True).debug("Processing video element: {}", lambda: video_element)
+        video_data = extract_data(video_element, list_scraper['video_item']['fields'])
+
+        if 'url' in video_data:
+            video_url = video_data['url']
+            if not video_url.startswith(('http://', 'https://')):
+                video_url = f"http:{video_url}" if video_url.startswith('//') else urllib.parse.urljoin(base_url, video_url)
+        elif 'video_key' in video_data:
+            video_url = construct_url(base_url, site_config['modes']['video']['url_pattern'], site_config, video_id=video_data['video_key'])
+        else:
+            logger.warning("Unable to construct video URL. Skipping.")
+            continue
+
+        video_title = video_data.get('title', '') or video_element.text.strip()
+        video_key = video_data.get('video_key')
+
+        if should_ignore_video({'title': video_title, 'url': video_url}, general_config['ignored'], general_config.get('ignored_whole_words', False)):
+            logger.info(f"Ignoring video: {video_title} - {video_url}")
+            count_result('ignored')
+            continue
+
+        if history is not None and not overwrite_files and history.is_known(site_key(site_config), video_url, video_key):
+            logger.info(f"Already downloaded: {video_title} - {video_url}")
+            count_result('known')
+            if crawl is not None:
+                crawl.note_known()
+            continue
+
+        if crawl is not None and crawl.is_processed(video_url):
+            logger.info(f"Already processed in this crawl: {video_title} - {video_url}")
+            count_result('known')
+            continue
+
+        logger.info(f"Found video: {video_title} - {video_url}")
+        on_done = None
+        if crawl is not None:
+            on_done = crawl.track(video_url)
+        if pipeline is not None:
+            if not pipeline.submit(video_url, site_config, general_config, overwrite_files, headers, video_key, on_done):
+                return LIST_FAILED, None
+        else:
+            status = process_video_page(video_url, site_config, general_config, overwrite_files, headers, video_key)
+            if on_done is not None:
+                on_done(status)
+
+    if next_url:
+        return next_url, current_page + 1
     return None, None
 
 
-def should_ignore_video(data, ignored_terms):
-    for term in ignored_terms:
-        term_lower = term.lower()
-        url_encoded_term = term.lower().replace(' ', '-')
+class IgnoreMatcher:
+    def __init__(self, terms, whole_words=False):
+        # Map every lowercased variant (plain and URL-encoded) back to the configured term
+        self.variants = {}
+        for term in terms:
+            term_lower = term.lower()
+            for variant in (term_lower, term_lower.replace(' ', '-'), term_lower.replace(' ', '+'), term_lower.replace(' ', '%20')):
+                self.variants.setdefault(variant, term)
+        self.regex = None
+        if self.variants:
+            pattern = '|'.join(re.escape(variant) for variant in sorted(self.variants, key=len, reverse=True))
+            if whole_words:
+                pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+            self.regex = re.compile(pattern, re.IGNORECASE)
+
+    def match(self, data):
+        if self.regex is None:
+            return None
         for field, value in data.items():
-            if isinstance(value, str):
-                if term_lower in value.lower() or url_encoded_term in value.lower():
-                    logger.info(f"Ignoring video due to term '{term}' found in {field}")
-                    return True
-            elif isinstance(value, list):
-                for item in value:
-                    if term_lower in item.lower() or url_encoded_term in item.lower():
-                        logger.info(f"Ignoring video due to term '{term}' found in {field}")
-                        return True
+            values = [value] if isinstance(value, str) else value if isinstance(value, list) else []
+            for item in values:
+                match = self.regex.search(item) if isinstance(item, str) else None
+                if match:
+                    return self.variants.get(match.group(0).lower(), match.group(0)), field
+        return None
+
+ignore_matchers = {}
+
+def should_ignore_video(data, ignored_terms, whole_words=False):
+    key = (tuple(ignored_terms or ()), whole_words)
+    if key not in ignore_matchers:
+        ignore_matchers[key] = IgnoreMatcher(key[0], whole_words)
+    match = ignore_matchers[key].match(data)
+    if match:
+        term, field = match
+        logger.info(f"Ignoring video due to term '{term}' found in {field}")
+        return True
     return False
 
-def process_video_page(url, site_config, general_config, overwrite_files=False, headers=None):
-    global last_vpn_action_time
+def process_video_page(url, site_config, general_config, overwrite_files=False, headers=None, video_key=None):
+    if history is not None and not overwrite_files and history.is_known(site_key(site_config), url, video_key):
+        logger.info(f"Already downloaded: {url}")
+        return count_result('known')
 
-    vpn_config = general_config.get('vpn', {})
-    if vpn_config.get('enabled', False):
-        current_time = time.time()
-        if current_time - last_vpn_action_time > vpn_config.get('new_node_time', 300):
-            handle_vpn(general_config, 'new_node')
+    # The whole video (page, download, upload) holds one slot so VPN rotations wait for it
+    with get_vpn_rotator().slot():
+        return _process_video_page(url, site_config, general_config, overwrite_files, headers, video_key)
 
+def _process_video_page(url, site_config, general_config, overwrite_files=False, headers=None, video_key=None):
     logger.info(f"Processing video page: {url}")
-    soup = fetch_page(url, general_config['user_agents'], headers)
+    soup = fetch_page(url, general_config['user_agents'], headers, kind='video')
     if soup is None:
         logger.error(f"Failed to fetch video page: {url}")
-        return
+        return count_result('failed')
 
     data = extract_data(soup, site_config['scrapers']['video_scraper'])
 
     # Check if the video should be ignored
-    if should_ignore_video(data, general_config['ignored']):
+    if should_ignore_video(data, general_config['ignored'], general_config.get('ignored_whole_words', False)):
         logger.info(f"Ignoring video: {data.get('title', url)}")
-        return
+        return count_result('ignored')
 
     file_name = construct_filename(data['title'], site_config, general_config)
 
-    destination_config = general_config['download_destinations'][0]
+    destinations = get_destinations(general_config)
+    if not overwrite_files:
+        existing = destinations.find(file_name)
+        if existing is not None:
+            logger.info(f"File '{file_name}' already exists on {existing.name}. Skipping download.")
+            record_history(site_config, url, 'exists', video_key=video_key, title=data['title'], destination=existing.name)
+            return count_result('exists')
+
+    if response_cache is not None and response_cache.offline:
+        logger.info(f"Offline mode: not downloading {file_name} from {data.get('download_url', url)}")
+        return count_result('offline')
+
+    candidates = destinations.candidates()
+    if not candidates:
+        logger.error(f"No destination is available for {file_name}")
+        record_history(site_config, url, 'failed', video_key=video_key, title=data['title'])
+        return count_result('failed')
+
+    status = 'failed'
+    size = None
+    stored_on = None
+    local_path = None
+    staged_in_place = False
+    download_url = data.get('download_url', url)
+    try:
+        for destination in candidates:
+            with destination.transfer():
+                if local_path is None and destination.can_stream and general_config.get('streaming', {}).get('enabled', False):
+                    logger.info(f"Streaming: {file_name} to {destination.name}")
+                    started = time.perf_counter()
+                    size = destination.stream(download_url, file_name, site_config, general_config)
+                    if size:
+                        status, stored_on = 'downloaded', destination
+                        # Download and upload overlap when streaming, so only the total can be measured
+                        destination.record_throughput(size, time.perf_counter() - started)
+                        break
+                    logger.warning("Streaming failed. Falling back to a staged download.")
+                    metrics.count('retries', stage='stream_fallback')
+
+                write_seconds = 0
+                if local_path is None:
+                    local_path = destination.staging_path(file_name)
+                    staged_in_place = destination.stages_in_place
+                    logger.info(f"Downloading: {file_name}")
+                    started = time.perf_counter()
+                    if not download_file(download_url, local_path, site_config, general_config):
+                        break
+                    size = os.path.getsize(local_path)
+                    if staged_in_place:
+                        # The download itself wrote to the destination
+                        write_seconds = time.perf_counter() - started
+
+                # Time only the store, so the CDN's speed does not count as the destination's
+                started = time.perf_counter()
+                if destination.store(local_path, file_name):
+                    status, stored_on = 'downloaded', destination
+                    destination.record_throughput(size, write_seconds + time.perf_counter() - started)
+                    break
+                destination.mark_down("storing the file failed")
+                metrics.count('retries', stage='destination_failover')
+    finally:
+        # Clean up the local temp file, or a partial download
+        if local_path is not None and os.path.exists(local_path) and (stored_on is None or not staged_in_place):
+            os.remove(local_path)
+
+    if stored_on is not None:
+        stored_on.stored(file_name)
+    record_history(site_config, url, status, video_key=video_key, title=data['title'], size=size, destination=stored_on.name if stored_on else None)
+
+    pause(general_config, 'between_videos', url)
+    return count_result(status)
+
+class SMBConnectionPool:
+    def __init__(self, destination_config, max_idle=4):
+        self.config = destination_config
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        conn = SMBConnection(self.config['username'], self.config['password'], "videoscraper", self.config['server'])
+        if not conn.connect(self.config['server'], self.config.get('port', 445), timeout=self.config.get('timeout', 30)):
+            raise ConnectionError(f"Failed to connect to SMB server {self.config['server']}")
+        return conn
+
+    def _acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
 
-    if destination_config['type'] == 'smb':
-        smb_destination_path = os.path.join(destination_config['path'], file_name)
-        if not overwrite_files and file_exists_on_smb(destination_config, smb_destination_path):
-            logger.info(f"File '{file_name}' already exists on SMB share. Skipping download.")
-            return
-        temp_dir = os.path.join(os.getcwd(), 'temp_downloads')
-        os.makedirs(temp_dir, exist_ok=True)
-        destination_path = os.path.join(temp_dir, file_name)
-    else:
-        destination_path = os.path.join(destination_config['path'], file_name)
-        if not overwrite_files and os.path.exists(destination_path):
-            logger.info(f"File '{file_name}' already exists locally. Skipping download.")
-            return
+    def run(self, operation, retries=1):
+        # Operation errors (missing file, access denied) leave the connection usable;
+        # transport errors drop it and retry once on a fresh connection.
+        for attempt in range(retries + 1):
+            conn = None
+            try:
+                conn = self._acquire()
+                result = operation(conn)
+            except OperationFailure:
+                self._release(conn)
+                raise
+            except (NotConnectedError, NotReadyError, SMBTimeout, OSError) as e:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                if attempt == retries:
+                    raise
+                metrics.count('retries', stage='smb')
+                logger.warning(f"SMB connection to {self.config['server']} failed ({e}). Reconnecting...")
+            else:
+                self._release(conn)
+                return result
 
-    logger.info(f"Downloading: {file_name}")
-    if download_file(data.get('download_url', url), destination_path, site_config, general_config):
-        if destination_config['type'] == 'smb':
-            upload_to_smb(destination_path, smb_destination_path, destination_config)
-            os.remove(destination_path)  # Clean up the local temp file
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
 
-    time.sleep(general_config['sleep']['between_videos'])
+def get_smb_pool(destination_config):
+    key = (destination_config['server'], destination_config['share'], destination_config['username'])
+    with smb_pools_lock:
+        if key not in smb_pools:
+            max_idle = destination_config.get('max_idle_connections', destination_config.get('max_connections', 4))
+            smb_pools[key] = SMBConnectionPool(destination_config, max_idle)
+        return smb_pools[key]
+
+def close_smb_pools():
+    with smb_pools_lock:
+        for pool in smb_pools.values():
+            pool.close()
+        smb_pools.clear()
+
+class ProgressReader:
+    def __init__(self, file, pbar):
+        self.file = file
+        self.pbar = pbar
+
+    def read(self, size=-1):
+        chunk = self.file.read(size)
+        self.pbar.update(len(chunk))
+        return chunk
+
+def replace_smb_file(conn, share, partial_path, smb_path):
+    try:
+        conn.deleteFiles(share, smb_path)
+    except OperationFailure:
+        pass
+    conn.rename(share, partial_path, smb_path)
+
+def store_on_smb(destination_config, smb_path, store, verify=None, retries=1):
+    # store(conn, path) writes the data to <smb_path>.part, which only replaces smb_path once it is
+    # complete (and verify(size) agrees), so a failed or killed transfer never leaves a truncated
+    # video under the real name or removes the copy that was already there
+    share = destination_config['share']
+    partial_path = f"{smb_path}.part"
+    pool = get_smb_pool(destination_config)
+    completed = False
+    try:
+        size = pool.run(lambda conn: store(conn, partial_path), retries)
+        if verify is not None and not verify(size):
+            return 0
+        pool.run(lambda conn: replace_smb_file(conn, share, partial_path, smb_path))
+        completed = True
+        return size
+    finally:
+        if not completed:
+            delete_from_smb(partial_path, destination_config)
 
 def upload_to_smb(local_path, smb_path, destination_config):
-    conn = SMBConnection(destination_config['username'], destination_config['password'], "videoscraper", destination_config['server'])
-    if conn.connect(destination_config['server'], 445):
-        file_size = os.path.getsize(local_path)
+    file_size = os.path.getsize(local_path)
+    timeout = destination_config.get('upload_timeout', 21600)
+
+    def store(conn, path):
         with open(local_path, 'rb') as file:
             with tqdm(total=file_size, unit='B', unit_scale=True, desc="Uploading to SMB") as pbar:
-                bytes_uploaded = 0
-                while bytes_uploaded < file_size:
-                    chunk = file.read(65536)  # Read in 64KB chunks
-                    if not chunk:
-                        break
-                    conn.storeFile(destination_config['share'], smb_path, io.BytesIO(chunk))
-                    bytes_uploaded += len(chunk)
-                    pbar.update(len(chunk))
-        conn.close()
+                return conn.storeFile(destination_config['share'], path, ProgressReader(file, pbar), timeout=timeout)
+
+    try:
+        started = time.perf_counter()
+        with metrics.timer('upload'):
+            store_on_smb(destination_config, smb_path, store)
+        metrics.observe_transfer('smb_upload', file_size, time.perf_counter() - started)
         logger.info(f"File uploaded to SMB share: {smb_path}")
-    else:
-        logger.error("Failed to connect to SMB share for upload.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to upload to SMB share: {e}")
+        return False
 
-def download_file(url, destination_path, site_config, general_config):
-    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+class StreamBuffer:
+    def __init__(self, source, max_chunks=64, chunk_size=1024 * 1024):
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.pending = bytearray()
+        self.eof = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._fill, args=(source, chunk_size), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _fill(self, source, chunk_size):
+        try:
+            while not self.closed.is_set():
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                self._put(chunk)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Stream source closed: {e}")
+        finally:
+            self._put(None)
 
+    def read(self, size=-1):
+        while not self.eof and (size is None or size < 0 or len(self.pending) < size):
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.eof = True
+                break
+            self.pending += chunk
+        if size is None or size < 0:
+            size = len(self.pending)
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        return data
+
+    def close(self):
+        self.closed.set()
+
+def build_download_command(url, destination_path, site_config, general_config):
     if url.startswith('//'):
         url = 'http:' + url
 
@@ -309,11 +1806,130 @@ def download_file(url, destination_path, site_config, general_config):
 
     logger.debug(f"Download URL: {url}")
     logger.debug(f"Executing command: {command}")
+    return command
+
+class CommandStream:
+    # The download command writes to stdout ("-" as destination for curl, wget and yt-dlp)
+    name = 'stream_command'
+
+    def __init__(self, url, site_config, general_config):
+        command = build_download_command(url, '-', site_config, general_config)
+        if 'curl' in command:
+            command = command.replace('curl -#', 'curl').replace('curl', 'curl -sS', 1)
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE, stderr=self.stderr)
+        self.source = self.process.stdout
+
+    def finish(self, received):
+        return self.process.wait() == 0 and received > 0
+
+    def abort(self):
+        self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        self.process.stdout.close()
+        self.stderr.seek(0)
+        logger.debug(f"Download command output: {self.stderr.read().decode(errors='replace').strip()}")
+        self.stderr.close()
+
+class HTTPStream:
+    name = 'stream_native'
+
+    def __init__(self, url, general_config):
+        if url.startswith('//'):
+            url = 'http:' + url
+        headers = {'User-Agent': random.choice(general_config['user_agents']), 'Accept-Encoding': 'identity'}
+        self.response = session.get(url, headers=headers, stream=True, timeout=30)
+        self.response.raise_for_status()
+        self.response.raw.decode_content = True
+        self.source = self.response.raw
+        self.expected = int(self.response.headers['Content-Length']) if 'Content-Length' in self.response.headers else None
+
+    def finish(self, received):
+        if self.expected is not None and received != self.expected:
+            logger.error(f"Stream ended after {received} of {self.expected} bytes")
+            return False
+        return received > 0
 
-    if 'yt-dlp' in command:
-        success = download_with_ytdlp(command)
-    else:
-        success = download_with_curl_wget(command)
+    def abort(self):
+        self.response.close()
+
+    def close(self):
+        self.response.close()
+
+def stream_to_smb(url, smb_path, destination_config, site_config, general_config):
+    # The download is fed through a bounded in-memory buffer straight into storeFile
+    streaming_config = general_config.get('streaming', {})
+    timeout = destination_config.get('upload_timeout', 21600)
+
+    try:
+        if get_download_engine(site_config, general_config) == 'native':
+            stream = HTTPStream(url, general_config)
+        else:
+            stream = CommandStream(url, site_config, general_config)
+    except (requests.exceptions.RequestException, OSError) as e:
+        logger.error(f"Could not start streaming download: {e}")
+        return 0
+
+    buffer = StreamBuffer(stream.source, streaming_config.get('buffer_mb', 64))
+    uploaded = 0
+    started = time.perf_counter()
+    try:
+        with tqdm(unit='B', unit_scale=True, desc="Streaming to SMB") as pbar:
+            def store(conn, path):
+                return conn.storeFile(destination_config['share'], path, ProgressReader(buffer, pbar), timeout=timeout)
+            uploaded = store_on_smb(destination_config, smb_path, store, verify=stream.finish, retries=0)
+        metrics.observe_stage('stream', time.perf_counter() - started)
+        if uploaded:
+            metrics.observe_transfer(stream.name, uploaded, time.perf_counter() - started)
+    except (Exception, KeyboardInterrupt) as e:
+        buffer.close()
+        stream.abort()
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        logger.error(f"Streaming upload failed: {e}")
+    finally:
+        stream.close()
+
+    if uploaded:
+        logger.info(f"File streamed to SMB share: {smb_path}")
+    return uploaded
+
+def delete_from_smb(smb_path, destination_config):
+    try:
+        get_smb_pool(destination_config).run(lambda conn: conn.deleteFiles(destination_config['share'], smb_path))
+        logger.debug(f"Removed partial file from SMB share: {smb_path}")
+    except Exception as e:
+        logger.debug(f"Could not remove partial file {smb_path}: {e}")
+
+def get_download_engine(site_config, general_config):
+    # yt-dlp sites always go through yt-dlp; curl/wget sites may use the built-in downloader
+    if 'yt-dlp' in site_config['download']['command']:
+        return 'ytdlp'
+    return site_config['download'].get('engine', general_config.get('downloader', {}).get('engine', 'command'))
+
+def download_file(url, destination_path, site_config, general_config):
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+
+    engine = get_download_engine(site_config, general_config)
+    started = time.perf_counter()
+    with metrics.timer('download'):
+        if engine == 'native':
+            success = download_native(url, destination_path, general_config)
+        elif engine == 'ytdlp' and use_embedded_ytdlp(general_config):
+            engine = 'ytdlp_embedded'
+            success = get_ytdlp_engine(site_config, general_config).download(url, destination_path)
+        else:
+            command = build_download_command(url, destination_path, site_config, general_config)
+            if 'yt-dlp' in command:
+                success = download_with_ytdlp(command)
+            else:
+                engine = 'curl' if 'curl' in command else 'wget'
+                success = download_with_curl_wget(command)
+
+    if success and os.path.exists(destination_path):
+        metrics.observe_transfer(engine, os.path.getsize(destination_path), time.perf_counter() - started)
 
     if success:
         logger.info("Download completed successfully.")
@@ -322,6 +1938,336 @@ def download_file(url, destination_path, site_config, general_config):
         logger.error("Download failed.")
         return False
 
+class RemoteFileChanged(requests.exceptions.RequestException):
+    pass
+
+class SegmentedDownload:
+    # Parallel HTTP Range download into <destination>.part, with per-segment progress
+    # kept in <destination>.part.json so an interrupted transfer resumes where it stopped.
+    def __init__(self, url, destination_path, headers, downloader_config, progress=None):
+        self.url = url
+        self.destination_path = destination_path
+        self.part_path = f"{destination_path}.part"
+        self.state_path = f"{self.part_path}.json"
+        self.headers = dict(headers, **{'Accept-Encoding': 'identity'})
+        self.segments = downloader_config.get('segments', 4)
+        self.min_segment_size = downloader_config.get('min_segment_mb', 8) * 1024 * 1024
+        self.retries = downloader_config.get('retries', 5)
+        self.chunk_size = downloader_config.get('chunk_kb', 1024) * 1024
+        self.timeout = downloader_config.get('timeout', 30)
+        self.progress = progress
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.state = None
+        self.validator = None
+        self.last_saved = 0
+
+    def probe(self):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._probe()
+            except (requests.exceptions.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Probing {self.url} failed ({e}). Retrying ({attempt + 1}/{self.retries})...")
+                metrics.count('retries', stage='probe')
+                self._backoff(attempt, e)
+
+    def _probe(self):
+        response = session.get(self.url, headers=dict(self.headers, Range='bytes=0-0'), stream=True, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+            # If-Range only accepts a strong ETag or a Last-Modified date
+            etag = response.headers.get('ETag')
+            self.validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+            if response.status_code == 206 and '/' in response.headers.get('Content-Range', ''):
+                total = response.headers['Content-Range'].rsplit('/', 1)[1]
+                if total.isdigit():
+                    return int(total), True
+            length = response.headers.get('Content-Length')
+            return (int(length) if length and length.isdigit() else None), False
+        finally:
+            response.close()
+
+    def _load_state(self, size):
+        try:
+            with open(self.state_path, 'r') as file:
+                state = json.load(file)
+            if state.get('size') == size and os.path.exists(self.part_path):
+                if state.get('validator') == self.validator:
+                    return state
+                logger.info("Remote file changed since the partial download. Starting over.")
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save_state(self, force=False):
+        if not force and time.time() - self.last_saved < 1:
+            return
+        self.last_saved = time.time()
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(self.state, file)
+        os.replace(temp_path, self.state_path)
+
+    def _report(self):
+        if self.progress is not None:
+            done = sum(segment['done'] for segment in self.state['segments'])
+            self.progress({'url': self.url, 'downloaded': done, 'total': self.state['size'], 'segments': len(self.state['segments'])})
+
+    def _backoff(self, attempt, error=None):
+        # A throttling server's Retry-After wins over the exponential backoff
+        response = getattr(error, 'response', None)
+        retry_after = None
+        if response is not None and response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            delay = min(retry_after, get_rate_limiter().config['max_backoff'])
+        else:
+            delay = min(30, 2 ** attempt) * random.uniform(0.5, 1.5)
+        time.sleep(delay)
+
+    def _fetch_segment(self, segment):
+        for attempt in range(self.retries + 1):
+            start = segment['start'] + segment['done']
+            if start > segment['end'] or self.cancelled.is_set():
+                return
+            try:
+                headers = dict(self.headers, Range=f"bytes={start}-{segment['end']}")
+                if self.validator:
+                    headers['If-Range'] = self.validator
+                response = session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+                with response:
+                    response.raise_for_status()
+                    if response.status_code == 200 and self.validator:
+                        # The server sends the whole (new) file when the validator no longer matches
+                        raise RemoteFileChanged(f"Remote file changed during download: {self.url}")
+                    if response.status_code != 206:
+                        raise requests.exceptions.HTTPError(f"Server ignored Range request (status {response.status_code})")
+                    with open(self.part_path, 'r+b', buffering=0) as file:
+                        file.seek(start)
+                        for chunk in response.iter_content(self.chunk_size):
+                            if self.cancelled.is_set():
+                                return
+                            file.write(chunk)
+                            with self.lock:
+                                segment['done'] += len(chunk)
+                                self._save_state()
+                                self._report()
+                if segment['start'] + segment['done'] > segment['end']:
+                    return
+                raise requests.exceptions.ConnectionError("Segment ended early")
+            except RemoteFileChanged:
+                raise
+            except (requests.exceptions.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Segment {segment['start']}-{segment['end']} failed ({e}). Retrying ({attempt + 1}/{self.retries})...")
+                metrics.count('retries', stage='segment')
+                self._backoff(attempt, e)
+
+    def _download_single(self, size):
+        # No Range support: one stream, restarted from zero on failure
+        for attempt in range(self.retries + 1):
+            try:
+                received = 0
+                with session.get(self.url, headers=self.headers, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    with open(self.part_path, 'wb') as file:
+                        for chunk in response.iter_content(self.chunk_size):
+                            file.write(chunk)
+                            received += len(chunk)
+                            if self.progress is not None:
+                                self.progress({'url': self.url, 'downloaded': received, 'total': size, 'segments': 1})
+                if size is not None and received != size:
+                    raise requests.exceptions.ConnectionError(f"Received {received} of {size} bytes")
+                return
+            except (requests.exceptions.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Download failed ({e}). Retrying ({attempt + 1}/{self.retries})...")
+                metrics.count('retries', stage='download')
+                self._backoff(attempt, e)
+
+    def run(self):
+        try:
+            return self._run()
+        except RemoteFileChanged as e:
+            # Segments already written belong to the old file, so start over once
+            logger.warning(f"{e}. Restarting the download.")
+            for path in (self.state_path, self.part_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.cancelled.clear()
+            return self._run()
+
+    def _run(self):
+        size, ranges = self.probe()
+        if not size or not ranges:
+            logger.debug(f"Range requests unsupported for {self.url}; using a single stream")
+            self._download_single(size)
+            os.replace(self.part_path, self.destination_path)
+            return True
+
+        self.state = self._load_state(size)
+        if self.state is not None:
+            logger.info(f"Resuming download at {sum(segment['done'] for segment in self.state['segments'])} of {size} bytes")
+        else:
+            count = max(1, min(self.segments, size // self.min_segment_size))
+            step = -(-size // count)
+            self.state = {'url': self.url, 'size': size, 'validator': self.validator, 'segments': [
+                {'start': start, 'end': min(start + step, size) - 1, 'done': 0} for start in range(0, size, step)
+            ]}
+            with open(self.part_path, 'wb') as file:
+                file.truncate(size)
+            self._save_state(force=True)
+
+        pending = [segment for segment in self.state['segments'] if segment['start'] + segment['done'] <= segment['end']]
+        executor = ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix='segment')
+        try:
+            for future in [executor.submit(self._fetch_segment, segment) for segment in pending]:
+                future.result()
+        except BaseException:
+            # Stop the other segments; what they already wrote stays recorded for resume
+            self.cancelled.set()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            with self.lock:
+                self._save_state(force=True)
+
+        downloaded = sum(segment['done'] for segment in self.state['segments'])
+        if downloaded != size or os.path.getsize(self.part_path) != size:
+            raise requests.exceptions.ConnectionError(f"Size mismatch: got {downloaded} bytes, expected {size}")
+        os.replace(self.part_path, self.destination_path)
+        os.remove(self.state_path)
+        return True
+
+def download_native(url, destination_path, general_config):
+    if url.startswith('//'):
+        url = 'http:' + url
+    logger.debug(f"Download URL: {url}")
+    headers = {'User-Agent': random.choice(general_config['user_agents'])}
+    pbar = tqdm(unit='B', unit_scale=True, desc="Downloading")
+
+    def progress(update):
+        if update['total'] and pbar.total != update['total']:
+            pbar.total = update['total']
+        pbar.update(update['downloaded'] - pbar.n)
+
+    try:
+        return SegmentedDownload(url, destination_path, headers, general_config.get('downloader', {}), progress).run()
+    except (requests.exceptions.RequestException, OSError) as e:
+        logger.error(f"Native download failed: {e}")
+        return False
+    except KeyboardInterrupt:
+        logger.warning("Download interrupted. Partial data kept for resume.")
+        return False
+    finally:
+        pbar.close()
+
+class YtdlpLogger:
+    def debug(self, message):
+        logger.debug(f"yt-dlp: {message}")
+
+    def info(self, message):
+        logger.debug(f"yt-dlp: {message}")
+
+    def warning(self, message):
+        logger.warning(f"yt-dlp: {message}")
+
+    def error(self, message):
+        # Errors are raised as DownloadError and logged by the caller
+        logger.debug(f"yt-dlp: {message}")
+
+class YtdlpEngine:
+    # Runs a site's yt-dlp download command through the Python API, reusing YoutubeDL
+    # instances (one per concurrent download) instead of starting a process per video.
+    DESTINATION = '__DESTINATION__'
+    URL = '__URL__'
+
+    def __init__(self, command, general_config):
+        user_agent = random.choice(general_config['user_agents'])
+        argv = shlex.split(command.format(destination_path=self.DESTINATION, url=self.URL, user_agent=user_agent))
+        argv = [arg for arg in argv[1:] if arg != self.URL]
+        self.params = yt_dlp.parse_options(argv).ydl_opts
+        self.params.update({
+            'ignoreerrors': False,
+            'noprogress': True,
+            'quiet': True,
+            'logger': YtdlpLogger(),
+        })
+        self.params.setdefault('http_headers', {}).setdefault('User-Agent', user_agent)
+        fragments = general_config.get('downloader', {}).get('ytdlp_fragments', 4)
+        if self.params.get('concurrent_fragment_downloads', 1) == 1:
+            self.params['concurrent_fragment_downloads'] = fragments
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        ydl = yt_dlp.YoutubeDL(dict(self.params))
+        ydl.progress_callback = None
+        ydl.add_progress_hook(lambda update: ydl.progress_callback and ydl.progress_callback(update))
+        return ydl
+
+    def _release(self, ydl):
+        with self.lock:
+            self.idle.append(ydl)
+
+    def download(self, url, destination_path):
+        if url.startswith('//'):
+            url = 'http:' + url
+        logger.debug(f"Download URL: {url}")
+        ydl = self._acquire()
+        pbar = tqdm(unit='B', unit_scale=True, desc="Downloading")
+
+        def progress(update):
+            if update['status'] != 'downloading':
+                return
+            total = update.get('total_bytes') or update.get('total_bytes_estimate')
+            if total and pbar.total != total:
+                pbar.total = total
+            pbar.update((update.get('downloaded_bytes') or 0) - pbar.n)
+
+        try:
+            # '%' starts an output template field, so literal ones in titles must be escaped
+            ydl.params['outtmpl'] = {'default': destination_path.replace('%', '%%')}
+            ydl.progress_callback = progress
+            for cookie in session.cookies:
+                ydl.cookiejar.set_cookie(cookie)
+            ydl.extract_info(url, download=True)
+            for cookie in ydl.cookiejar:
+                session.cookies.set_cookie(cookie)
+            return True
+        except yt_dlp.utils.DownloadError as e:
+            logger.error(f"yt-dlp failed: {e}")
+            return False
+        except KeyboardInterrupt:
+            logger.warning("Download interrupted.")
+            return False
+        finally:
+            ydl.progress_callback = None
+            pbar.close()
+            self._release(ydl)
+
+def use_embedded_ytdlp(general_config):
+    if general_config.get('downloader', {}).get('ytdlp_engine', 'embedded') != 'embedded':
+        return False
+    if yt_dlp is None:
+        logger.debug("yt_dlp module not installed. Running yt-dlp as a command.")
+        return False
+    return True
+
+def get_ytdlp_engine(site_config, general_config):
+    command = site_config['download']['command']
+    with ytdlp_engines_lock:
+        if command not in ytdlp_engines:
+            ytdlp_engines[command] = YtdlpEngine(command, general_config)
+        return ytdlp_engines[command]
+
 def download_with_ytdlp(command):
     process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
     progress_regex = re.compile(r'\[download\]\s+(\d+\.\d+)% of ~?\s*(\d+\.\d+)(K|M|G)iB')
@@ -389,27 +2335,469 @@ def download_with_curl_wget(command):
         logger.warning("Download interrupted.")
         return False
 
-def file_exists_on_smb(destination_config, path):
-    conn = SMBConnection(destination_config['username'], destination_config['password'], "videoscraper", destination_config['server'])
-    if conn.connect(destination_config['server'], 445):
+class DestinationListing:
+    def __init__(self, lister, refresh_interval=900, case_sensitive=True):
+        self.lister = lister
+        self.refresh_interval = refresh_interval
+        self.case_sensitive = case_sensitive
+        self.names = None
+        self.added = set()
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def _normalize(self, name):
+        return name if self.case_sensitive else name.lower()
+
+    def refresh(self):
+        started = time.time()
+        with self.lock:
+            self.added = set()
+        names = {self._normalize(name) for name in self.lister()}
+        with self.lock:
+            # Keep names added by uploads that finished while the listing was running
+            self.names = names | self.added
+            self.loaded_at = time.time()
+        logger.debug(f"Indexed {len(names)} files at destination in {time.time() - started:.1f}s")
+
+    def _stale(self):
+        return self.names is None or (self.refresh_interval and time.time() - self.loaded_at > self.refresh_interval)
+
+    def contains(self, name):
+        # Only one thread lists the destination; the others wait for the first listing,
+        # or keep using the previous one while it is being refreshed
+        if self._stale():
+            if self.names is None:
+                with self.refresh_lock:
+                    if self._stale():
+                        self.refresh()
+            elif self.refresh_lock.acquire(blocking=False):
+                try:
+                    if self._stale():
+                        self.refresh()
+                finally:
+                    self.refresh_lock.release()
+        with self.lock:
+            return self._normalize(name) in self.names
+
+    def add(self, name):
+        with self.lock:
+            self.added.add(self._normalize(name))
+            if self.names is not None:
+                self.names.add(self._normalize(name))
+
+def list_smb_directory(destination_config):
+    entries = get_smb_pool(destination_config).run(lambda conn: conn.listPath(destination_config['share'], destination_config['path']))
+    return [entry.filename for entry in entries if not entry.isDirectory]
+
+def list_local_directory(path):
+    if not os.path.isdir(path):
+        return []
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries if entry.is_file()]
+
+class Destination:
+    # Common health, failover and throughput bookkeeping; subclasses do the I/O
+    case_sensitive = True
+    can_stream = False
+    stages_in_place = False
+
+    def __init__(self, config, general_config):
+        destinations_config = general_config.get('destinations', {})
+        self.config = config
+        self.name = describe_destination(config)
+        self.health_interval = destinations_config.get('health_interval', 60)
+        self.retry_interval = destinations_config.get('retry_interval', 60)
+        self.min_free = config.get('min_free_mb', destinations_config.get('min_free_mb', 1024)) * 1024 * 1024
+        self.checked_at = 0
+        self.down_until = 0
+        self.failures = 0
+        self.active = 0
+        self.throughput = None
+        self.lock = threading.Lock()
+        self.use_index = general_config.get('destination_index', {}).get('enabled', True)
+        self.listing = DestinationListing(self.list_files, general_config.get('destination_index', {}).get('refresh_interval', 900), self.case_sensitive)
+
+    def available(self):
+        now = time.time()
+        with self.lock:
+            if now < self.down_until:
+                return False
+            if now - self.checked_at < self.health_interval:
+                return True
+            self.checked_at = now
         try:
-            conn.getAttributes(destination_config['share'], path)
-            return True
+            self.check()
         except Exception as e:
-            logger.debug(f"Error checking file existence on SMB: {e}")
+            self.mark_down(f"health check failed: {e}")
             return False
+        return True
+
+    def mark_down(self, reason):
+        with self.lock:
+            self.failures += 1
+            delay = min(self.retry_interval * 2 ** (self.failures - 1), 3600)
+            self.down_until = time.time() + delay
+            self.checked_at = 0
+        metrics.count('destination_failures', destination=self.name)
+        logger.warning(f"Destination {self.name} unavailable ({reason}). Skipping it for {delay}s.")
+
+    def mark_up(self):
+        with self.lock:
+            self.failures = 0
+
+    @contextmanager
+    def transfer(self):
+        with self.lock:
+            self.active += 1
+        try:
+            yield
         finally:
-            conn.close()
-    else:
-        logger.error("Failed to connect to SMB share.")
+            with self.lock:
+                self.active -= 1
+
+    def record_throughput(self, size, seconds):
+        if not size or seconds <= 0:
+            return
+        with self.lock:
+            rate = size / seconds
+            self.throughput = rate if self.throughput is None else 0.7 * self.throughput + 0.3 * rate
+
+    def load(self):
+        # Expected time to finish one more transfer here, relative to the others
+        with self.lock:
+            if self.throughput is None:
+                return 0
+            return (self.active + 1) / self.throughput
+
+    def exists(self, file_name):
+        if self.use_index:
+            try:
+                return self.listing.contains(file_name)
+            except Exception as e:
+                logger.warning(f"Could not list destination {self.name} ({e}). Checking file directly.")
+        return self.file_exists(file_name)
+
+    def staging_path(self, file_name):
+        return os.path.join(os.getcwd(), 'temp_downloads', file_name)
+
+    def stored(self, file_name):
+        self.listing.add(file_name)
+        self.mark_up()
+
+class LocalDestination(Destination):
+    # Downloads go straight to their final place
+    stages_in_place = True
+
+    def __init__(self, config, general_config):
+        config = dict(config, path=os.path.expanduser(config['path']))
+        super().__init__(config, general_config)
+
+    def check(self):
+        os.makedirs(self.config['path'], exist_ok=True)
+        if not os.access(self.config['path'], os.W_OK):
+            raise OSError("not writable")
+        free = shutil.disk_usage(self.config['path']).free
+        if free < self.min_free:
+            raise OSError(f"only {free // (1024 * 1024)} MB free")
+
+    def list_files(self):
+        return list_local_directory(self.config['path'])
+
+    def file_exists(self, file_name):
+        return os.path.exists(os.path.join(self.config['path'], file_name))
+
+    def staging_path(self, file_name):
+        return os.path.join(self.config['path'], file_name)
+
+    def store(self, local_path, file_name):
+        destination_path = os.path.join(self.config['path'], file_name)
+        if local_path != destination_path:
+            try:
+                os.makedirs(self.config['path'], exist_ok=True)
+                shutil.move(local_path, destination_path)
+            except OSError as e:
+                logger.error(f"Failed to move {local_path} to {destination_path}: {e}")
+                return False
+        return True
+
+class SMBDestination(Destination):
+    # SMB shares are case-insensitive
+    case_sensitive = False
+    can_stream = True
+
+    def check(self):
+        pool = get_smb_pool(self.config)
+        try:
+            pool.run(lambda conn: conn.getAttributes(self.config['share'], self.config['path']))
+        except OperationFailure:
+            pool.run(lambda conn: conn.createDirectory(self.config['share'], self.config['path']))
+
+    def list_files(self):
+        return list_smb_directory(self.config)
+
+    def file_exists(self, file_name):
+        return file_exists_on_smb(self.config, os.path.join(self.config['path'], file_name))
+
+    def store(self, local_path, file_name):
+        return upload_to_smb(local_path, os.path.join(self.config['path'], file_name), self.config)
+
+    def stream(self, url, file_name, site_config, general_config):
+        return stream_to_smb(url, os.path.join(self.config['path'], file_name), self.config, site_config, general_config)
+
+class WebDAVDestination(Destination):
+    QUOTA_QUERY = (b'<?xml version="1.0" encoding="utf-8"?><d:propfind xmlns:d="DAV:"><d:prop>'
+                   b'<d:resourcetype/><d:quota-available-bytes/></d:prop></d:propfind>')
+
+    def __init__(self, config, general_config):
+        super().__init__(config, general_config)
+        self.session = requests.Session()
+        if config.get('username'):
+            self.session.auth = (config['username'], config.get('password', ''))
+        self.base_url = f"{config['url'].rstrip('/')}/{urllib.parse.quote(config['path'].strip('/'))}/"
+
+    def _url(self, file_name=''):
+        return self.base_url + urllib.parse.quote(file_name)
+
+    def _propfind(self, depth):
+        response = self.session.request('PROPFIND', self.base_url, data=self.QUOTA_QUERY, timeout=30,
+                                        headers={'Depth': str(depth), 'Content-Type': 'application/xml'})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return ElementTree.fromstring(response.content)
+
+    def check(self):
+        tree = self._propfind(0)
+        if tree is None:
+            self.session.request('MKCOL', self.base_url, timeout=30).raise_for_status()
+            return
+        free = tree.findtext('.//{DAV:}quota-available-bytes')
+        if free and free.strip().isdigit() and int(free) < self.min_free:
+            raise OSError(f"only {int(free) // (1024 * 1024)} MB of quota left")
+
+    def list_files(self):
+        tree = self._propfind(1)
+        if tree is None:
+            return []
+        names = []
+        for response in tree.findall('{DAV:}response'):
+            if response.find('.//{DAV:}collection') is not None:
+                continue
+            href = response.findtext('{DAV:}href', '')
+            names.append(urllib.parse.unquote(href.rstrip('/').rsplit('/', 1)[-1]))
+        return names
+
+    def file_exists(self, file_name):
+        try:
+            return self.session.head(self._url(file_name), timeout=30).status_code == 200
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to reach WebDAV share: {e}")
+            return False
+
+    def store(self, local_path, file_name):
+        # PUT to <name>.part and MOVE it over the real name, so a failed upload never replaces or deletes a good copy
+        file_size = os.path.getsize(local_path)
+        partial_url = self._url(f"{file_name}.part")
+        try:
+            started = time.perf_counter()
+            with metrics.timer('upload'), open(local_path, 'rb') as file:
+                with tqdm(total=file_size, unit='B', unit_scale=True, desc="Uploading to WebDAV") as pbar:
+                    response = self.session.put(partial_url, data=ProgressReader(file, pbar), timeout=(30, self.config.get('upload_timeout', 21600)),
+                                                headers={'Content-Length': str(file_size)})
+            response.raise_for_status()
+            self.session.request('MOVE', partial_url, timeout=30,
+                                 headers={'Destination': self._url(file_name), 'Overwrite': 'T'}).raise_for_status()
+            metrics.observe_transfer('webdav_upload', file_size, time.perf_counter() - started)
+            logger.info(f"File uploaded to WebDAV share: {self._url(file_name)}")
+            return True
+        except (requests.exceptions.RequestException, OSError) as e:
+            logger.error(f"Failed to upload {local_path} to WebDAV share: {e}")
+            try:
+                self.session.delete(partial_url, timeout=30)
+            except requests.exceptions.RequestException:
+                pass
+            return False
+
+DESTINATION_TYPES = {'local': LocalDestination, 'smb': SMBDestination, 'webdav': WebDAVDestination}
+
+class DestinationSet:
+    def __init__(self, destinations, strategy='ordered'):
+        self.destinations = destinations
+        self.strategy = strategy
+
+    def find(self, file_name):
+        with metrics.timer('exists_check'):
+            for destination in self.destinations:
+                # A full or failing destination can still answer from its last listing
+                if destination.listing.names is None and not destination.available():
+                    continue
+                if destination.exists(file_name):
+                    return destination
+        return None
+
+    def candidates(self):
+        healthy = [destination for destination in self.destinations if destination.available()]
+        if self.strategy == 'throughput':
+            # Stable sort: equally loaded destinations keep their configured priority
+            healthy.sort(key=lambda destination: destination.load())
+        return healthy
+
+def get_destinations(general_config):
+    destination_configs = general_config['download_destinations']
+    with destination_sets_lock:
+        destination_set = destination_sets.get(id(destination_configs))
+        if destination_set is None:
+            destinations = []
+            for config in destination_configs:
+                if config.get('type') not in DESTINATION_TYPES:
+                    logger.error(f"Unknown destination type '{config.get('type')}'. Skipping it.")
+                    continue
+                destinations.append(DESTINATION_TYPES[config['type']](config, general_config))
+            strategy = general_config.get('destinations', {}).get('strategy', 'ordered')
+            destination_set = destination_sets[id(destination_configs)] = DestinationSet(destinations, strategy)
+        return destination_set
+
+def file_exists_on_smb(destination_config, path):
+    try:
+        get_smb_pool(destination_config).run(lambda conn: conn.getAttributes(destination_config['share'], path))
+        return True
+    except OperationFailure as e:
+        logger.debug(f"Error checking file existence on SMB: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to connect to SMB share: {e}")
+        return False
+
+class VPNRotator:
+    # Rotation is a barrier: network work runs inside slot(), a rotation stops new slots from
+    # being handed out, waits for the active ones to drain, switches nodes, checks connectivity
+    # and then lets everyone continue. Slots are reentrant per thread.
+    def __init__(self, general_config):
+        vpn_config = general_config.get('vpn', {})
+        self.general_config = general_config
+        self.enabled = vpn_config.get('enabled', False)
+        self.interval = vpn_config.get('new_node_time', 300)
+        self.ban_threshold = vpn_config.get('ban_threshold', 0.5)
+        self.window = deque(maxlen=vpn_config.get('ban_window', 20))
+        self.drain_timeout = vpn_config.get('drain_timeout', 600)
+        self.check_url = vpn_config.get('check_url')
+        self.check_attempts = vpn_config.get('check_attempts', 5)
+        self.markers = [marker.lower() for marker in vpn_config.get('captcha_markers', [])]
+        self.condition = threading.Condition()
+        self.holders = {}
+        self.active = 0
+        self.rotating = False
+        self.ban_reason = None
+        self.last_rotation = time.time()
+
+    @contextmanager
+    def slot(self):
+        if not self.enabled:
+            yield
+            return
+        thread = threading.get_ident()
+        with self.condition:
+            if thread not in self.holders:
+                reason = self._due()
+                if reason and not self.rotating:
+                    self._rotate(reason)
+                while self.rotating:
+                    self.condition.wait()
+                self.active += 1
+            self.holders[thread] = self.holders.get(thread, 0) + 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.holders[thread] -= 1
+                if self.holders[thread] == 0:
+                    del self.holders[thread]
+                    self.active -= 1
+                    self.condition.notify_all()
+
+    def _due(self):
+        if self.ban_reason:
+            return self.ban_reason
+        if time.time() - self.last_rotation > self.interval:
+            return 'timer'
+        return None
+
+    def observe(self, response):
+        if not self.enabled or not self.ban_threshold:
+            return
+        blocked = response.status_code in (403, 429, 503) or self._is_captcha(response)
+        with self.condition:
+            self.window.append(blocked)
+            if blocked and len(self.window) >= max(3, self.window.maxlen // 2):
+                rate = sum(self.window) / len(self.window)
+                if rate >= self.ban_threshold and not self.ban_reason:
+                    self.ban_reason = f"{rate:.0%} of the last {len(self.window)} responses blocked"
+                    logger.warning(f"Looks like we're being blocked ({self.ban_reason}). Rotating VPN node.")
+
+    def _is_captcha(self, response):
+        # Challenge interstitials usually come as 403/503; markers are for sites that serve them as 200
+        if not self.markers or response.status_code != 200 or 'html' not in response.headers.get('Content-Type', ''):
+            return False
+        text = response.content[:100000].decode(errors='replace').lower()
+        return any(marker in text for marker in self.markers)
+
+    def _rotate(self, reason):
+        # Called with the condition held by a thread that holds no slot
+        self.rotating = True
+        try:
+            logger.info(f"Rotating VPN node ({reason}). Waiting for {self.active} active transfers to finish...")
+            with metrics.timer('vpn_drain'):
+                drained = self.condition.wait_for(lambda: self.active == 0, timeout=self.drain_timeout)
+            if not drained:
+                logger.warning(f"{self.active} transfers still running after {self.drain_timeout}s. Rotating anyway.")
+            self.condition.release()
+            try:
+                for attempt in range(self.check_attempts):
+                    if handle_vpn(self.general_config, 'new_node') and self.connected():
+                        break
+                    logger.warning(f"VPN is not connected after rotating. Trying another node ({attempt + 1}/{self.check_attempts})...")
+                else:
+                    logger.error("VPN rotation failed. Continuing anyway.")
+                get_rate_limiter().reset()
+            finally:
+                self.condition.acquire()
+            metrics.count('vpn_rotations', reason='timer' if reason == 'timer' else 'blocked')
+        finally:
+            self.window.clear()
+            self.ban_reason = None
+            self.last_rotation = time.time()
+            self.rotating = False
+            self.condition.notify_all()
+
+    def connected(self):
+        if not self.check_url:
+            return True
+        for attempt in range(self.check_attempts):
+            try:
+                response = requests.get(self.check_url, timeout=10)
+                if response.status_code < 500:
+                    return True
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Connectivity check failed: {e}")
+            time.sleep(2)
         return False
 
+def configure_vpn(general_config):
+    global vpn_rotator
+    vpn_rotator = VPNRotator(general_config)
+
+def get_vpn_rotator():
+    global vpn_rotator
+    if vpn_rotator is None:
+        vpn_rotator = VPNRotator({})
+    return vpn_rotator
+
 def handle_vpn(general_config, action='start'):
-    global last_vpn_action_time
     vpn_config = general_config.get('vpn', {})
 
     if not vpn_config.get('enabled', False):
-        return
+        return False
 
     vpn_bin = vpn_config.get('vpn_bin', '')
 
@@ -421,87 +2809,301 @@ def handle_vpn(general_config, action='start'):
         cmd = vpn_config.get('new_node_cmd', '').format(vpn_bin=vpn_bin)
     else:
         logger.error(f"Unknown VPN action: {action}")
-        return
+        return False
 
     try:
-        subprocess.run(cmd, shell=True, check=True)
-        last_vpn_action_time = time.time()
+        with metrics.timer('vpn'):
+            subprocess.run(cmd, shell=True, check=True)
         logger.info(f"VPN action '{action}' executed successfully")
+        return True
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to execute VPN action '{action}': {e}")
+        return False
 
-def process_direct_link(url, general_config):
-    for site_config_file in os.listdir(CONFIG_DIR):
-        if site_config_file.endswith('.yaml'):
-            site_config = load_site_config(site_config_file[:-5])  # Remove .yaml extension
-            if url.startswith(site_config['base_url']):
-                logger.info(f"Detected direct link for site: {site_config_file[:-5]}")
-                headers = general_config.get('headers', {}).copy()  # Create a copy of the headers
-                headers['User-Agent'] = random.choice(general_config['user_agents'])  # Add a random User-Agent
-                process_video_page(url, site_config, general_config, overwrite_files=True, headers=headers)
-                return True
-    return False
+def process_direct_link(url, general_config, pipeline=None):
+    site, site_config = get_registry().resolve(url)
+    if site_config is None:
+        return False
+    logger.info(f"Detected direct link for site: {site}")
+    headers = general_config.get('headers', {}).copy()  # Create a copy of the headers
+    headers['User-Agent'] = random.choice(general_config['user_agents'])  # Add a random User-Agent
+    if pipeline is not None:
+        return pipeline.submit(url, site_config, general_config, True, headers)
+    return process_video_page(url, site_config, general_config, overwrite_files=True, headers=headers) != 'failed'
+
+def create_prefetcher(site_config, general_config, mode=None, headers=None):
+    depth = general_config.get('prefetch', {}).get('pages', 2)
+    if depth <= 0:
+        return None
+    list_scraper = site_config['scrapers']['list_scraper']
+
+    def fetch(url):
+        soup = fetch_list_page(url, site_config, general_config, mode, headers)
+        video_elements = find_video_elements(soup, list_scraper, url) if soup is not None else None
+        return soup, bool(video_elements)
+    return ListPrefetcher(fetch, depth, lambda url: pause(general_config, 'between_pages', url))
+
+def run_job(site, site_config, mode, identifier, general_config, overwrite_files=False, headers=None, pipeline=None, resume=False, incremental=False):
+    if mode not in site_config['modes']:
+        logger.error(f"Unsupported mode '{mode}' for site '{site}'")
+        return False
+
+    if mode == 'video':
+        url = construct_url(site_config['base_url'], site_config['modes'][mode]['url_pattern'], site_config, video_id=identifier)
+        if pipeline is not None:
+            return pipeline.submit(url, site_config, general_config, overwrite_files, headers)
+        return process_video_page(url, site_config, general_config, overwrite_files, headers) != 'failed'
+
+    url = construct_url(site_config['base_url'], site_config['modes'][mode]['url_pattern'], site_config, **{mode: identifier})
+    current_page = 1
+    crawl = Crawl(checkpoints, site, mode, identifier, resume) if checkpoints is not None else None
+    if crawl is not None and crawl.url:
+        url, current_page = crawl.url, crawl.page
+        logger.info(f"Resuming {site} {mode} '{identifier}' at page {current_page}: {url}")
+
+    # Incremental crawls usually stop after a page or two, so fetching pages ahead would mostly be wasted
+    prefetcher = None if incremental else create_prefetcher(site_config, general_config, mode, headers)
+    first_page = current_page
+    try:
+        while url:
+            logger.info(f"Processing: {url}")
+            if crawl is not None:
+                crawl.save_page(url, current_page)
+            next_page, new_page_number = process_list_page(url, site_config, general_config, current_page, mode, identifier, overwrite_files, headers, pipeline, crawl, prefetcher)
+            if next_page is LIST_FAILED:
+                # Keep the checkpoint so --resume picks up from here
+                logger.warning(f"Stopped {site} {mode} '{identifier}' at page {current_page}. Run again with --resume to continue.")
+                # Only a crawl that got past its first page counts as (partly) done
+                return current_page != first_page
+            if next_page is None:
+                break
+            # Ignored videos say nothing about how far the last run got, so only known ones count
+            if incremental and crawl is not None and crawl.page_new == 0 and crawl.page_known:
+                logger.info(f"No new videos on page {current_page}. Stopping incremental crawl.")
+                break
+            url = next_page
+            current_page = new_page_number
+            if prefetcher is None:
+                # The prefetcher already waits between_pages before each background fetch
+                pause(general_config, 'between_pages', url)
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+    if crawl is not None:
+        crawl.finish()
+    return True
+
+def parse_job(parts):
+    # A job is either a direct URL or a "site mode identifier..." triple
+    if len(parts) == 1 and parts[0].startswith('http'):
+        return ('url', parts[0])
+    if len(parts) < 3:
+        raise ValueError("expected a URL or 'site mode identifier'")
+    return (parts[0], parts[1], ' '.join(parts[2:]))
+
+def read_jobs(input_path):
+    jobs = []
+    file = sys.stdin if input_path == '-' else open(input_path, 'r')
+    try:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                jobs.append(parse_job(shlex.split(line)))
+            except ValueError as e:
+                logger.warning(f"Skipping line {line_number} of {input_path}: {e}")
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    return jobs
+
+def group_jobs(jobs):
+    # De-duplicate, then group by site (first-seen order) so each site's jobs run together
+    groups = {}
+    seen = set()
+    for job in jobs:
+        if job[0] == 'url':
+            site, _ = get_registry().resolve(job[1])
+            key = ('url', canonical_url(job[1]))
+        else:
+            site = job[0]
+            key = job
+        if key in seen:
+            continue
+        seen.add(key)
+        groups.setdefault(site, []).append(job)
+    return groups
+
+def describe_job(job):
+    return job[1] if job[0] == 'url' else ' '.join(job)
+
+def log_summary(job_results):
+    if len(job_results) > 1:
+        failed = [job for job, ok in job_results if not ok]
+        logger.info(f"Jobs: {len(job_results)} run, {len(job_results) - len(failed)} succeeded, {len(failed)} failed")
+        for job in failed:
+            logger.info(f"  Failed: {describe_job(job)}")
+    videos = metrics.counter_values('videos', 'status')
+    if videos:
+        logger.info("Videos: " + ', '.join(f"{count} {status}" for status, count in sorted(videos.items())))
+
+def write_metrics(args):
+    if args.profile:
+        write_profile(args.profile)
+    if args.prometheus:
+        write_atomically(args.prometheus, metrics.prometheus())
+    if args.stats == '-':
+        print(json.dumps(metrics.summary(), indent=2))
+    elif args.stats:
+        write_atomically(args.stats, json.dumps(metrics.summary(), indent=2))
+        logger.info(f"Run statistics written to {args.stats}")
 
 def main():
     parser = argparse.ArgumentParser(description='Video Scraper')
-    parser.add_argument('args', nargs='+', help='Site identifier and mode, or direct URL')
+    parser.add_argument('args', nargs='*', help='Site identifier and mode, or direct URL')
+    parser.add_argument('--input', help="File of URLs and/or 'site mode identifier' lines to process in one run ('-' for stdin)")
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
     parser.add_argument('--overwrite_files', action='store_true', help='Overwrite existing files')
+    parser.add_argument('--workers', type=int, help='Number of videos to fetch, download and upload in parallel')
+    parser.add_argument('--stream', action='store_true', help='Stream downloads straight to SMB destinations without a local temp copy')
+    parser.add_argument('--resume', action='store_true', help='Resume interrupted list crawls from their last checkpoint')
+    parser.add_argument('--incremental', action='store_true', help='Stop paginating at the first page with no new videos')
+    parser.add_argument('--offline', action='store_true', help='Serve pages only from the HTTP cache and skip downloads')
+    parser.add_argument('--stats', nargs='?', const='-', metavar='FILE', help="Write per-stage timings and counters as JSON to FILE ('-' or no value for stdout)")
+    parser.add_argument('--prometheus', metavar='FILE', help='Keep a Prometheus textfile-collector file updated with the run metrics')
+    parser.add_argument('--profile', metavar='FILE', help='Profile the run with cProfile and save the merged stats to FILE')
+    parser.add_argument('--distributed', action='store_true', help='Add videos found by crawls to the shared job queue and work through it with the other nodes')
+    parser.add_argument('--worker', action='store_true', help='Work through the shared job queue (no crawl arguments needed)')
     args = parser.parse_args()
 
     log_level = "DEBUG" if args.debug else "INFO"
     logger.remove()
     logger.add(sys.stderr, level=log_level)
 
-    general_config = load_config(os.path.join(SCRIPT_DIR, 'config.yaml'))
+    global history, checkpoints, profiling, job_queue
 
-    # Check if it's a direct link
-    if len(args.args) == 1 and args.args[0].startswith('http'):
-        if process_direct_link(args.args[0], general_config):
-            return
-        else:
-            logger.error("Unrecognized URL. Please provide a supported direct link or use the standard command format.")
+    jobs = []
+    if args.args:
+        try:
+            jobs.append(parse_job(args.args))
+        except ValueError:
+            logger.error("Invalid number of arguments. Please provide site, mode, and identifier.")
             sys.exit(1)
+    if args.input:
+        jobs.extend(read_jobs(args.input))
+    if not jobs and not args.worker:
+        parser.error("provide a direct URL, 'site mode identifier', --input or --worker")
+    distributed = args.distributed or args.worker
 
-    # Standard command format
-    if len(args.args) < 3:
-        logger.error("Invalid number of arguments. Please provide site, mode, and identifier.")
+    general_config = load_config(os.path.join(SCRIPT_DIR, 'config.yaml'))
+    configure_parser(general_config)
+    history_config = general_config.get('history', {})
+    history_path = history_config.get('path', os.path.join(STATE_DIR, 'history.db'))
+    distributed_config = general_config.get('distributed', {})
+    if distributed:
+        # Nodes share the download history kept next to the job queue
+        queue_path = os.path.join(SCRIPT_DIR, os.path.expanduser(distributed_config.get('path', os.path.join(STATE_DIR, 'queue.db'))))
+        job_queue = JobQueue(queue_path, distributed_config.get('lease', 600), distributed_config.get('max_attempts', 3))
+        history_path = distributed_config.get('history_path', os.path.join(os.path.dirname(queue_path), 'history.db'))
+    if history_config.get('enabled', True) or distributed:
+        history = DownloadHistory(os.path.join(SCRIPT_DIR, os.path.expanduser(history_path)))
+    checkpoints = CrawlCheckpoints(os.path.join(STATE_DIR, 'crawls.db'))
+    configure_response_cache(general_config, args.offline)
+    configure_rate_limiter(general_config)
+    if args.offline:
+        general_config.setdefault('vpn', {})['enabled'] = False
+    if args.stream:
+        general_config.setdefault('streaming', {})['enabled'] = True
+    if args.prometheus:
+        start_prometheus_writer(args.prometheus, general_config.get('metrics', {}).get('prometheus_interval', 15))
+    main_profiler = None
+    if args.profile:
+        profiling = True
+        main_profiler = start_thread_profiler()
+
+    if args.offline and distributed:
+        parser.error("--offline cannot be combined with --distributed or --worker")
+    if args.incremental and history is None:
+        parser.error("--incremental needs the download history (history.enabled in config.yaml)")
+
+    groups = group_jobs(jobs)
+    if len(jobs) == 1 and None in groups:
+        logger.error("Unrecognized URL. Please provide a supported direct link or use the standard command format.")
         sys.exit(1)
 
-    site, mode, identifier = args.args[0], args.args[1], ' '.join(args.args[2:])
-    site_config = load_site_config(site)
-
     # Extract headers from general_config
     headers = general_config.get('headers', {})
 
     handle_vpn(general_config, 'start')
-
-    if mode not in site_config['modes']:
-        logger.error(f"Unsupported mode '{mode}' for site '{site}'")
-        sys.exit(1)
-
-    if mode == 'video':
-        url = construct_url(site_config['base_url'], site_config['modes'][mode]['url_pattern'], site_config, video_id=identifier)
-    else:
-        url = construct_url(site_config['base_url'], site_config['modes'][mode]['url_pattern'], site_config, **{mode: identifier})
-
+    configure_vpn(general_config)
+
+    concurrency_config = general_config.get('concurrency', {})
+    workers = args.workers or concurrency_config.get('workers', 1)
+    pipeline = None
+    if workers > 1 and (distributed or len(jobs) > 1 or jobs[0][0] != 'url' and jobs[0][1] != 'video'):
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers * 2)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        pipeline = VideoPipeline(workers, concurrency_config.get('queue_size', 0), concurrency_config.get('per_host', 2))
+    queue_worker = None
+    if distributed:
+        queue_worker = QueueWorker(job_queue, general_config, pipeline, workers, distributed_config.get('poll_interval', 5))
+        # Crawls only enqueue; the queue worker feeds the pipeline with jobs claimed from any node's crawls
+        pipeline = QueueSubmitter(job_queue)
+
+    job_results = []
     try:
-        if mode == 'video':
-            process_video_page(url, site_config, general_config, args.overwrite_files, headers)
-        else:
-            current_page = 1
-            while url:
-                logger.info(f"Processing: {url}")
-                next_page, new_page_number = process_list_page(url, site_config, general_config, current_page, mode, identifier, args.overwrite_files, headers)
-                if next_page is None:
-                    break
-                url = next_page
-                current_page = new_page_number
-                time.sleep(general_config['sleep']['between_pages'])
+        for site, site_jobs in groups.items():
+            for job in site_jobs:
+                if site is None:
+                    logger.error(f"Unrecognized URL: {job[1]}")
+                    job_results.append((job, False))
+                    continue
+                if job[0] == 'url':
+                    job_results.append((job, process_direct_link(job[1], general_config, pipeline)))
+                    continue
+                try:
+                    site_config = load_site_config(site)
+                except KeyError as e:
+                    logger.error(e.args[0])
+                    job_results.append((job, False))
+                    continue
+                job_results.append((job, run_job(site, site_config, job[1], job[2], general_config, args.overwrite_files, headers, pipeline, args.resume, args.incremental)))
+        if queue_worker is not None:
+            # Crawling nodes stop once the queue is empty; dedicated workers wait for more jobs
+            idle_timeout = (distributed_config.get('idle_timeout', 300) or None) if args.worker else 0
+            logger.info("Working through the job queue...")
+            queue_worker.finish(idle_timeout)
+            pipeline = queue_worker.pipeline
+        if pipeline is not None:
+            logger.info("Waiting for queued videos to finish...")
+            pipeline.close()
     except KeyboardInterrupt:
         logger.warning("Script interrupted by user. Exiting gracefully...")
-
+        if queue_worker is not None:
+            queue_worker.cancel()
+        elif pipeline is not None:
+            pipeline.cancel()
+    finally:
+        if queue_worker is not None:
+            queue_worker.close()
+        close_smb_pools()
+        if history is not None:
+            history.close()
+        checkpoints.close()
+        stop_thread_profiler(main_profiler)
+    if job_queue is not None:
+        counts = job_queue.counts()
+        logger.info("Job queue: " + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+        job_queue.close()
+
+    log_summary(job_results)
+    write_metrics(args)
     logger.info("Scraping process completed.")
+    if len(jobs) == 1 and job_results and not job_results[0][1] and jobs[0][0] != 'url':
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()